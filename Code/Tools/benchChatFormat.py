@@ -0,0 +1,101 @@
+"""
+Benchmark: JSON chats vs the binary layout (chatBinary), load and save.
+
+Usage:
+    python Tools/benchChatFormat.py [chat.json ...] [--messages N]
+
+Without chat files, synthetic coding chats of a few sizes are used. Load is
+what chatStore does on open (read the file, decode); save is a full rewrite
+(encode and write the base file, no fsync).
+"""
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import chatBinary
+import chatStore
+
+REPEATS = 10
+SIZES = (200, 2000, 10000)
+
+CODE = '''```python
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)   # "quoted" \\ escaped
+```'''
+
+
+def synthetic_chat(messages):
+    rng = random.Random(messages)
+    words = ["the", "model", "returns", "a", "value", "for", "each", "chat", "é", "→", "`x`", "\"s\""]
+    chat = []
+    for i in range(messages):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(20, 200)))
+        msg = {"role": "user" if i % 2 == 0 else "assistant",
+               "content": text + ("\n\n" + CODE if i % 3 == 0 else ""),
+               "ts": 1700000000.0 + i * 30, "id": i + 1}
+        if i % 2:
+            msg["response_time"] = round(rng.uniform(0.5, 20), 2)
+            msg["stats"] = {"ttft": 0.12, "tokens_per_s": 41.5, "prompt_tokens": 900 + i,
+                            "completion_tokens": 300}
+        chat.append(msg)
+    return {
+        "Format": chatStore.CHAT_FORMAT, "Name": f"bench {messages}", "Bot Path": "", "Temperature": 0.7,
+        "Model": "openai/gpt-oss-20b", "Chat": chat,
+        "Payload": [{"role": "system", "content": "You are a helpful assistant."}]
+                   + [{"ref": msg["id"], "tokens": 120} for msg in chat]
+    }
+
+
+def best_of(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench(name, doc, tmp):
+    json_path = tmp / "bench.json"
+    bin_path = tmp / "bench.chatbin"
+    json_path.write_bytes(chatStore._encode(doc, False))
+    bin_path.write_bytes(chatBinary.dumps(doc))
+    assert chatBinary.loads(bin_path.read_bytes()) == doc, "binary layout does not round-trip"
+
+    json_load = best_of(lambda: json.loads(json_path.read_text(encoding="utf-8")))
+    bin_load = best_of(lambda: chatBinary.loads(bin_path.read_bytes()))
+    json_save = best_of(lambda: json_path.write_bytes(chatStore._encode(doc, False)))
+    bin_save = best_of(lambda: bin_path.write_bytes(chatBinary.dumps(doc)))
+    print(
+        f"{name}: {len(doc.get('Chat', []))} messages | "
+        f"size {json_path.stat().st_size / 1024:.0f} → {bin_path.stat().st_size / 1024:.0f} KiB | "
+        f"load {json_load:.1f} → {bin_load:.1f} ms ({json_load / bin_load:.1f}x) | "
+        f"save {json_save:.1f} → {bin_save:.1f} ms ({json_save / bin_save:.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs binary chat load/save benchmark")
+    parser.add_argument("chats", nargs="*", help="chat .json files (journals are folded in)")
+    parser.add_argument("--messages", type=int, nargs="*", default=SIZES, help="synthetic chat sizes")
+    args = parser.parse_args()
+
+    docs = [(Path(p).stem, chatStore.store.read(p)) for p in args.chats] or \
+           [(f"synthetic {n}", synthetic_chat(n)) for n in args.messages]
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        for name, doc in docs:
+            bench(name, doc, tmp)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
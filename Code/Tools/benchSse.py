@@ -0,0 +1,118 @@
+"""
+Micro-benchmark: SseDecoder vs the old per-line json.loads loop.
+
+Usage:
+    python Tools/benchSse.py [recorded_stream.txt ...]
+
+Record a stream from the server with:
+    curl -N http://<ip>:8000/v1/chat/completions -H "Content-Type: application/json" \
+         -d '{"model": "openai/gpt-oss-20b", "stream": true, "messages": [...]}' > stream.txt
+
+Without arguments a synthetic vLLM-shaped stream is used.
+"""
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sseDecoder import SseDecoder, orjson
+
+REPEATS = 20
+CHUNK_SIZES = (512, 1400)    # requests' iter_lines default, roughly one TCP segment per read
+
+
+def synthetic_stream(tokens=4000):
+    rng = random.Random(0)
+    words = ["the", "model", " def", " return", "\n", "    ", "value", "\"x\"", "é", "→", "`", "{", "}"]
+    frames = [{
+        "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0,
+        "model": "openai/gpt-oss-20b",
+        "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "logprobs": None, "finish_reason": None}]
+    }]
+    for _ in range(tokens):
+        frames.append({
+            "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0,
+            "model": "openai/gpt-oss-20b",
+            "choices": [{"index": 0, "delta": {"content": rng.choice(words)}, "logprobs": None, "finish_reason": None}]
+        })
+    frames.append({
+        "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0,
+        "model": "openai/gpt-oss-20b",
+        "choices": [{"index": 0, "delta": {}, "logprobs": None, "finish_reason": "stop"}]
+    })
+    body = b"".join(
+        b"data: " + json.dumps(f, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n\n"
+        for f in frames
+    )
+    return body + b"data: [DONE]\n\n"
+
+
+def chunks_of(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def old_loop(chunks):
+    """The previous _stream_request: iter_lines(), startswith, slice, json.loads, nested lookup."""
+    out = []
+    pending = None
+    for chunk in chunks:
+        if pending is not None:
+            chunk = pending + chunk
+        lines = chunk.splitlines()
+        pending = lines.pop() if lines and lines[-1] and chunk[-1:] == lines[-1][-1:] else None
+        for line in lines:
+            if not line or not line.startswith(b"data: "):
+                continue
+            data = line[6:]
+            if data == b"[DONE]":
+                return out
+            parsed = json.loads(data)
+            delta = parsed["choices"][0]["delta"]
+            if "content" in delta:
+                out.append(delta["content"])
+    return out
+
+
+def new_loop(chunks):
+    decoder = SseDecoder()
+    out = []
+    for chunk in chunks:
+        out.extend(decoder.feed(chunk))
+        if decoder.done:
+            break
+    return out
+
+
+def bench(fn, chunks):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    streams = [(p, Path(p).read_bytes()) for p in sys.argv[1:]] or [("synthetic", synthetic_stream())]
+    print(f"JSON backend: {'orjson' if orjson else 'json'}")
+    for name, data in streams:
+        frames = data.count(b"data: ")
+        for size in CHUNK_SIZES:
+            # Both loops see the same reads, so only the decoding differs
+            chunks = chunks_of(data, size)
+            assert "".join(old_loop(chunks)) == "".join(new_loop(chunks)), "decoders disagree"
+
+            old_t = bench(old_loop, chunks)
+            new_t = bench(new_loop, chunks)
+            print(
+                f"{name}: {frames} frames, {len(data) / 1024:.0f} KiB, {size} B reads | "
+                f"old {old_t * 1e6 / frames:.2f} µs/frame | "
+                f"new {new_t * 1e6 / frames:.2f} µs/frame | "
+                f"{old_t / new_t:.1f}x faster"
+            )
+
+
+if __name__ == "__main__":
+    main()
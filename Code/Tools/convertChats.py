@@ -0,0 +1,71 @@
+"""
+Switch saved chats between JSON (Name.json) and the binary layout (Name.chatbin).
+
+Usage:
+    python Tools/convertChats.py <Save/Chat directory or chat files> --to binary|json [--dry-run]
+
+The app reads either and keeps a chat in the layout it finds it in; the
+journal is folded in, so each chat ends up as one base file. Every chat is
+checked to round-trip through the binary layout unchanged before it is
+converted. --to json is also the way to export a binary chat as plain JSON.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import chatBinary
+import chatStore
+
+
+def chat_paths(targets):
+    for target in targets:
+        if Path(target).is_dir():
+            yield from chatStore.chat_files(target)
+        else:
+            yield chatStore.chat_path(target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert saved chats between JSON and the binary layout")
+    parser.add_argument("targets", nargs="+", help="the Save/Chat folder, or single chat files")
+    parser.add_argument("--to", choices=("binary", "json"), required=True)
+    parser.add_argument("--dry-run", action="store_true", help="only check and report the sizes")
+    args = parser.parse_args()
+
+    binary = args.to == "binary"
+    store = chatStore.store
+    total_before = total_after = 0
+    converted = 0
+    start = time.perf_counter()
+
+    for path in chat_paths(args.targets):
+        name = Path(path).stem
+        try:
+            doc = store.read(path)
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+            continue
+        if chatBinary.loads(chatBinary.dumps(doc)) != doc:
+            print(f"❌ {name}: does not round-trip through the binary layout, left alone")
+            continue
+
+        before, _ = chatStore.file_stat(path)
+        if args.dry_run:
+            after = len(chatStore._encode(doc, binary))
+        else:
+            after = store.convert(path, binary)
+
+        converted += 1
+        total_before += before
+        total_after += after
+        print(f"✅ {name}: {before / 1024:.1f} KB → {after / 1024:.1f} KB")
+
+    if converted:
+        print(f"\n{converted} chat(s) → {args.to}: {total_before / 1024:.1f} KB → {total_after / 1024:.1f} KB "
+              f"in {time.perf_counter() - start:.2f}s" + (" [dry run]" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    main()
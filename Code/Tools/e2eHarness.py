@@ -0,0 +1,272 @@
+"""
+End-to-end run of LLMClient against the local stub server.
+
+Usage:
+    python Tools/e2eHarness.py [--turns 5] [--concurrency 4] [--ttft 0.15] [--rate 120]
+                               [--jitter 0.1] [--restart 1.0] [--json]
+
+Starts Tools/stubServer.py in-process, then drives one client through
+send, regenerate, edit, abort, concurrent chats, a model switch and an
+injected failure, and reports latency and throughput per scenario.
+Nothing needs the GPU box; the same seed gives the same stream timing.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import PySide6
+from PySide6.QtCore import QCoreApplication
+
+import llmClient
+from stubServer import StubServer
+
+STUB_PORT = 18000          # away from a real server on 8000/9000
+STUB_ADMIN_PORT = 19000
+TURN_TIMEOUT = 60
+PRESET = "You are a terse assistant used for latency tests."
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Harness:
+    def __init__(self, app, server, models):
+        self.app = app
+        self.server = server
+        self.models = models
+        self.client = llmClient.LLMClient(str(Path(__file__).resolve().parent.parent))
+        self.client.set_server(server.host, str(server.port), str(server.admin_port))
+        self.client.prewarm_enabled = False      # measured separately (prewarm_report)
+        self.errors = []
+        self.client.error.connect(self.errors.append)
+        # Keys whose last generation has been handled on this thread (stats recorded)
+        self.idle = set()
+        self.client.generating_changed.connect(self.on_generating)
+        self.results = {}
+
+    # ----------------------
+    # Helpers
+    # ----------------------
+    def on_generating(self, key, busy):
+        if busy:
+            self.idle.discard(key)
+        else:
+            self.idle.add(key)
+
+    def wait_until(self, predicate, timeout=TURN_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() > deadline:
+                raise TimeoutError("harness step timed out")
+            self.app.processEvents()
+            time.sleep(0.001)
+
+    def chat(self, key, model):
+        ctx = self.client.activate(key)
+        ctx.model_name = model
+        ctx.preset = PRESET
+        return ctx
+
+    def turn(self, ctx):
+        """Generate into ctx and wait; returns the reply's stats."""
+        self.client.generate(ctx)
+        self.wait_until(lambda: ctx.key in self.idle)
+        return dict(ctx.response_stats)
+
+    def drop_reply(self, ctx):
+        for history in (ctx.messages, ctx.payload_messages):
+            if history and history[-1]["role"] == "assistant":
+                history.pop()
+
+    def record(self, name, stats, wall, **extra):
+        stats = [s for s in stats if s]
+        ttft = [s["ttft"] for s in stats]
+        queue = [s["queue"] for s in stats]
+        rates = [s["tokens_per_s"] for s in stats if s["tokens_per_s"]]
+        tokens = sum(s["completion_tokens"] for s in stats)
+        self.results[name] = dict({
+            "n": len(stats),
+            "ttft_p50_ms": round(percentile(ttft, 50) * 1000, 1) if ttft else None,
+            "ttft_p95_ms": round(percentile(ttft, 95) * 1000, 1) if ttft else None,
+            "queue_max_s": round(max(queue), 2) if queue else None,
+            "itl_p50_ms": percentile([s["itl_p50_ms"] for s in stats], 50),
+            "itl_p95_ms": percentile([s["itl_p95_ms"] for s in stats], 95),
+            "tokens_per_read_max": max((s["tokens_per_read"] for s in stats), default=None),
+            "decode_tok_s": round(sum(rates) / len(rates), 1) if rates else None,
+            "throughput_tok_s": round(tokens / wall, 1) if wall else None,
+            "wall_s": round(wall, 2)
+        }, **extra)
+
+    # ----------------------
+    # Scenarios
+    # ----------------------
+    def send(self, turns):
+        ctx = self.chat("A", self.models[0])
+        stats = []
+        start = time.perf_counter()
+        for i in range(turns):
+            self.client.add_user_message(f"Question {i}: how fast is this?", ctx=ctx)
+            stats.append(self.turn(ctx))
+        self.record("send", stats, time.perf_counter() - start)
+
+    def regenerate(self, turns):
+        ctx = self.chat("A", self.models[0])
+        stats = []
+        start = time.perf_counter()
+        for _ in range(turns):
+            self.client.abort_generation(wait=True, ctx=ctx)
+            self.drop_reply(ctx)
+            stats.append(self.turn(ctx))
+        self.record("regenerate", stats, time.perf_counter() - start)
+
+    def edit(self, turns):
+        ctx = self.chat("A", self.models[0])
+        stats = []
+        start = time.perf_counter()
+        for i in range(turns):
+            self.drop_reply(ctx)
+            edited = {"role": "user", "content": f"Edited question {i}: and now?"}
+            self.client.count_tokens(edited)
+            ctx.messages[-1] = edited
+            ctx.payload_messages[-1] = edited
+            stats.append(self.turn(ctx))
+        self.record("edit", stats, time.perf_counter() - start)
+
+    def abort(self, turns):
+        ctx = self.chat("A", self.models[0])
+        latencies = []
+        aborted_before = self.server.stats["aborted"]
+        start = time.perf_counter()
+        for i in range(turns):
+            self.client.add_user_message(f"Long answer please {i}", ctx=ctx)
+            self.client.generate(ctx)
+            self.wait_until(lambda: len(ctx.current_response) > 20)
+            latency = self.client.abort_generation(wait=True, ctx=ctx)
+            if latency is not None:
+                latencies.append(latency)
+            ctx.messages.pop()
+            ctx.payload_messages.pop()
+        # The server notices the hang-up on its next write
+        self.wait_until(lambda: self.server.stats["aborted"] - aborted_before >= turns, timeout=5)
+        self.results["abort"] = {
+            "n": turns,
+            "cancel_p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+            "cancel_max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+            "server_aborts": self.server.stats["aborted"] - aborted_before,
+            "wall_s": round(time.perf_counter() - start, 2)
+        }
+
+    def concurrent(self, chats):
+        contexts = [self.chat(f"C{i}", self.models[0]) for i in range(chats)]
+        start = time.perf_counter()
+        for i, ctx in enumerate(contexts):
+            self.client.add_user_message(f"Parallel question {i}", ctx=ctx)
+            self.client.generate(ctx)
+        self.wait_until(lambda: all(ctx.key in self.idle for ctx in contexts))
+        self.record("concurrent", [ctx.response_stats for ctx in contexts], time.perf_counter() - start,
+                    chats=chats)
+
+    def switch(self):
+        """A chat on the other model forces a swap; then the first model comes back."""
+        stats = []
+        timings = []
+        start = time.perf_counter()
+        for key, model in (("B", self.models[1]), ("A", self.models[0])):
+            ctx = self.chat(key, model)
+            self.client.add_user_message("Which model are you?", ctx=ctx)
+            stats.append(self.turn(ctx))
+            timings.append(dict(self.client.switcher.timings))
+        totals = [t.get("total", 0.0) for t in timings]
+        self.record("switch", stats, time.perf_counter() - start,
+                    swaps=self.client.scheduler.swaps,
+                    swap_total_s=round(sum(totals), 2),
+                    waiting_s=[round(t.get("waiting", 0.0), 2) for t in timings])
+
+    def failure(self):
+        ctx = self.chat("A", self.models[0])
+        errors_before = len(self.errors)
+        self.server.fail_next = 1
+        self.client.add_user_message("This one fails", ctx=ctx)
+        start = time.perf_counter()
+        self.client.generate(ctx)
+        self.wait_until(lambda: ctx.key in self.idle)
+        ctx.messages.pop()
+        ctx.payload_messages.pop()
+        self.results["failure"] = {
+            "errors_reported": len(self.errors) - errors_before,
+            "detect_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive LLMClient end to end against the stub server")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--ttft", type=float, default=0.15)
+    parser.add_argument("--rate", type=float, default=120)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--max-tokens", type=int, default=60)
+    parser.add_argument("--restart", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if PySide6.__version__ == "6.12.0" and sys.version_info < (3, 12):
+        # Signal.emit() there drops a reference to True on every call
+        print("❌ PySide6 6.12.0 corrupts True's refcount on Python < 3.12; expect a crash at exit "
+              "(see requirements.txt)")
+
+    models = ["stub/model-a", "stub/model-b"]
+    server = StubServer(
+        port=STUB_PORT, admin_port=STUB_ADMIN_PORT, models=models,
+        ttft=args.ttft, rate=args.rate, jitter=args.jitter, max_tokens=args.max_tokens,
+        restart_time=args.restart, seed=args.seed
+    ).start()
+    app = QCoreApplication([])
+    harness = Harness(app, server, models)
+
+    harness.send(args.turns)
+    harness.regenerate(args.turns)
+    harness.edit(args.turns)
+    harness.abort(args.turns)
+    harness.concurrent(args.concurrency)
+    harness.switch()
+    harness.failure()
+
+    report = {
+        "scenarios": harness.results,
+        "pool": harness.client.pool_stats(),
+        "coalescer": harness.client.coalescer.stats(),
+        "server": dict(server.stats)
+    }
+    # Every thread is joined and the Qt objects are gone before the interpreter shuts down
+    harness.client.close()
+    server.stop()
+    del harness
+    app.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    print()
+    for name, result in report["scenarios"].items():
+        fields = " | ".join(f"{key} {value}" for key, value in result.items())
+        print(f"{name:<11} {fields}")
+    pool = report["pool"]
+    for name, stats in (("pool", pool), ("  stream", pool["stream"]), ("  side", pool["side"])):
+        print(f"{name:<11} requests {stats['requests']} | connections {stats['connections']} | reuse {stats['reuse_ratio']}")
+    print(f"{'coalescer':<11} " + " | ".join(f"{key} {value}" for key, value in report["coalescer"].items()))
+    print(f"{'server':<11} " + " | ".join(f"{key} {value}" for key, value in report["server"].items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Convert saved chats to the deduplicated format (chat format 2) in one go.
+
+Usage:
+    python Tools/migrateChats.py <Save/Chat directory> [--dry-run]
+
+Chats are migrated on first open anyway; this does a whole directory up
+front and reports what it saves. Journals are folded in first, so a chat
+ends up as one base file. Already migrated chats are left alone.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import chatStore
+
+
+def encoded_size(doc):
+    # Same layout as persistence.write_json_atomic
+    return len(json.dumps(doc, indent=4, ensure_ascii=False).encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate saved chats to chat format 2")
+    parser.add_argument("directory", help="the Save/Chat folder of the app data directory")
+    parser.add_argument("--dry-run", action="store_true", help="only report the sizes")
+    args = parser.parse_args()
+
+    store = chatStore.ChatStore()
+    total_before = total_after = 0
+    migrated = 0
+    start = time.perf_counter()
+
+    for path in sorted(Path(args.directory).glob("*.json")):
+        entry = store._entry(path)
+        try:
+            doc, _, _, _ = store._read(entry)
+        except Exception as e:
+            print(f"❌ {path.name}: {e}")
+            continue
+
+        before = encoded_size(doc)
+        if not chatStore.migrate(doc):
+            print(f"   {path.name}: already format {doc.get(chatStore.FORMAT_KEY)}")
+            continue
+        after = encoded_size(doc)
+        if not args.dry_run:
+            store.write(path, doc)
+
+        migrated += 1
+        total_before += before
+        total_after += after
+        refs = sum(1 for item in doc["Payload"] if "ref" in item)
+        print(f"✅ {path.name}: {before / 1024:.1f} KB → {after / 1024:.1f} KB "
+              f"({refs}/{len(doc['Payload'])} payload entries are refs)")
+
+    if migrated:
+        print(f"\n{migrated} chat(s): {total_before / 1024:.1f} KB → {total_after / 1024:.1f} KB "
+              f"({100 * (1 - total_after / total_before):.0f}% smaller) in {time.perf_counter() - start:.2f}s"
+              + (" [dry run]" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Local stand-in for the vLLM box: an OpenAI-style chat server plus the
+admin endpoint that restarts it with another model.
+
+Usage:
+    python Tools/stubServer.py [--ttft 0.2] [--rate 60] [--jitter 0.1]
+                               [--fail-rate 0.0] [--restart 5] [--models a,b]
+
+Endpoints (same paths and ports as the real server):
+    POST :8000/v1/chat/completions   streaming (SSE) and non-streaming
+    GET  :8000/v1/models
+    POST :9000/admin/switch_model?model=...
+    GET  :8000/stub/stats            counters for test harnesses
+
+Timing is deterministic for a given --seed. Prompt prefixes are cached
+like vLLM's prefix cache: only the uncached part of a prompt pays
+--prefill-ms per 1k prompt characters on top of --ttft.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+from aiohttp import web
+
+# ======================
+# CONFIG
+# ======================
+PORT = 8000
+ADMIN_PORT = 9000
+MODELS = ["openai/gpt-oss-20b", "openai/gpt-oss-120b"]
+CONTEXT_LENGTH = 8192
+TTFT = 0.2                 # seconds before the first token, prompt cached
+PREFILL_MS = 20            # extra ms per 1k uncached prompt characters
+TOKEN_RATE = 60            # tokens per second while decoding
+JITTER = 0.1               # ± share of each token gap
+MAX_TOKENS = 200           # reply length when the request sets none
+RESTART_TIME = 5.0         # seconds the server is down during a switch
+
+WORDS = ["the", " model", " streams", " a", " token", " at", " a", " time", ",", " and", "\n", " é", " →", " \"ok\""]
+
+
+class StubServer:
+    """
+    The stub as an object, so a harness can start it in-process,
+    change its behaviour between steps and read its counters.
+    """
+    def __init__(self, host="127.0.0.1", port=PORT, admin_port=ADMIN_PORT, models=None,
+                 ttft=TTFT, prefill_ms=PREFILL_MS, rate=TOKEN_RATE, jitter=JITTER,
+                 max_tokens=MAX_TOKENS, fail_rate=0.0, restart_time=RESTART_TIME,
+                 context_length=CONTEXT_LENGTH, seed=0):
+        self.host = host
+        self.port = port
+        self.admin_port = admin_port
+        self.models = list(models or MODELS)
+        self.model = self.models[0]
+        self.ttft = ttft
+        self.prefill_ms = prefill_ms
+        self.rate = rate
+        self.jitter = jitter
+        self.max_tokens = max_tokens
+        self.fail_rate = fail_rate
+        self.fail_next = 0             # force this many upcoming requests to fail
+        self.restart_time = restart_time
+        self.context_length = context_length
+
+        self._rng = random.Random(seed)
+        self._down_until = 0.0
+        self._prefixes = set()
+        self._ids = 0
+        self.loop = None
+        self._thread = None
+        self._runners = []
+        self.stats = {
+            "requests": 0, "streams": 0, "completed": 0, "aborted": 0,
+            "failed": 0, "rejected": 0, "switches": 0,
+            "prefix_hits": 0, "prefill_chars": 0
+        }
+
+    # ----------------------
+    # Lifecycle
+    # ----------------------
+    def start(self):
+        """Serve on a background thread; returns once both ports are listening."""
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="StubServer", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._open())
+        ready.set()
+        self.loop.run_forever()
+
+    async def _open(self):
+        chat = web.Application()
+        chat.router.add_post("/v1/chat/completions", self.chat_completions)
+        chat.router.add_get("/v1/models", self.list_models)
+        chat.router.add_get("/stub/stats", self.get_stats)
+        admin = web.Application()
+        admin.router.add_post("/admin/switch_model", self.switch_model)
+
+        for app, port in ((chat, self.port), (admin, self.admin_port)):
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, self.host, port).start()
+            self._runners.append(runner)
+
+    def stop(self, timeout=5):
+        async def _close():
+            for runner in self._runners:
+                await runner.cleanup()
+
+        asyncio.run_coroutine_threadsafe(_close(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
+
+    def restarting(self):
+        return time.monotonic() < self._down_until
+
+    # ----------------------
+    # Endpoints
+    # ----------------------
+    async def list_models(self, request):
+        if self.restarting():
+            raise web.HTTPServiceUnavailable()
+        return web.json_response({
+            "object": "list",
+            "data": [{"id": self.model, "object": "model", "max_model_len": self.context_length}]
+        })
+
+    async def get_stats(self, request):
+        return web.json_response(dict(self.stats, model=self.model, restarting=self.restarting()))
+
+    async def switch_model(self, request):
+        model = request.query.get("model")
+        if model is None and request.can_read_body:
+            model = (await request.json()).get("model")
+        if not model:
+            raise web.HTTPBadRequest(text="model missing")
+
+        if model not in self.models:
+            self.models.append(model)
+        self.model = model
+        self._prefixes.clear()            # a restart empties the KV cache
+        self._down_until = time.monotonic() + self.restart_time
+        self.stats["switches"] += 1
+        print(f"Switching to {model} ({self.restart_time}s)")
+        return web.json_response({"status": "switching", "model": model})
+
+    async def chat_completions(self, request):
+        if self.restarting():
+            raise web.HTTPServiceUnavailable()
+        body = await request.json()
+        self.stats["requests"] += 1
+
+        if body.get("model") != self.model:
+            self.stats["rejected"] += 1
+            return web.json_response(
+                {"error": {"message": f"The model `{body.get('model')}` does not exist."}}, status=404
+            )
+        if self.fail_next or self._rng.random() < self.fail_rate:
+            self.fail_next = max(self.fail_next - 1, 0)
+            self.stats["failed"] += 1
+            return web.json_response({"error": {"message": "Injected failure"}}, status=500)
+
+        messages = body.get("messages", [])
+        prompt_tokens = sum(len(m.get("content", "")) // 4 + 4 for m in messages)
+        max_tokens = body.get("max_tokens") or self.max_tokens
+        completion = [self._rng.choice(WORDS) for _ in range(max_tokens)]
+
+        await asyncio.sleep(self._prefill_time(messages))
+
+        if not body.get("stream"):
+            await asyncio.sleep(max_tokens * self._gap())
+            self.stats["completed"] += 1
+            return web.json_response({
+                "id": self._next_id(), "object": "chat.completion", "model": self.model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(completion)},
+                             "finish_reason": "length"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": max_tokens,
+                          "total_tokens": prompt_tokens + max_tokens}
+            })
+
+        return await self._stream(request, body, completion, prompt_tokens)
+
+    # ----------------------
+    # Helpers
+    # ----------------------
+    def _prefill_time(self, messages):
+        """TTFT plus the cost of the prompt part not already in the prefix cache."""
+        uncached = 0
+        total = 0
+        key = ""
+        for msg in messages:
+            key += json.dumps(msg, sort_keys=True)
+            size = len(msg.get("content", ""))
+            total += size
+            if key not in self._prefixes:
+                self._prefixes.add(key)
+                uncached += size
+        if uncached < total:
+            self.stats["prefix_hits"] += 1
+        self.stats["prefill_chars"] += uncached
+        return self.ttft + uncached / 1000 * self.prefill_ms / 1000
+
+    def _gap(self):
+        gap = 1.0 / self.rate
+        return max(gap * (1 + self._rng.uniform(-self.jitter, self.jitter)), 0.0)
+
+    def _next_id(self):
+        self._ids += 1
+        return f"chatcmpl-stub-{self._ids}"
+
+    def _frame(self, chunk_id, delta, finish_reason=None):
+        chunk = {
+            "id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": self.model,
+            "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish_reason}]
+        }
+        return b"data: " + json.dumps(chunk, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n\n"
+
+    async def _stream(self, request, body, completion, prompt_tokens):
+        self.stats["streams"] += 1
+        chunk_id = self._next_id()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            await response.write(self._frame(chunk_id, {"role": "assistant", "content": ""}))
+            for word in completion:
+                await response.write(self._frame(chunk_id, {"content": word}))
+                await asyncio.sleep(self._gap())
+            await response.write(self._frame(chunk_id, {}, "length"))
+
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage = {
+                    "id": chunk_id, "object": "chat.completion.chunk", "model": self.model, "choices": [],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(completion),
+                              "total_tokens": prompt_tokens + len(completion)}
+                }
+                await response.write(b"data: " + json.dumps(usage).encode("utf-8") + b"\n\n")
+            await response.write(b"data: [DONE]\n\n")
+        except asyncio.CancelledError:
+            self.stats["aborted"] += 1
+            raise
+        except ConnectionResetError:
+            # The client hung up: vLLM would abort the sequence here
+            self.stats["aborted"] += 1
+            return response
+        self.stats["completed"] += 1
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the vLLM chat and admin servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--admin-port", type=int, default=ADMIN_PORT)
+    parser.add_argument("--models", default=",".join(MODELS), help="comma separated; the first is loaded")
+    parser.add_argument("--ttft", type=float, default=TTFT)
+    parser.add_argument("--prefill-ms", type=float, default=PREFILL_MS)
+    parser.add_argument("--rate", type=float, default=TOKEN_RATE, help="tokens per second")
+    parser.add_argument("--jitter", type=float, default=JITTER)
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--restart", type=float, default=RESTART_TIME, help="seconds down per switch")
+    parser.add_argument("--context", type=int, default=CONTEXT_LENGTH)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StubServer(
+        host=args.host, port=args.port, admin_port=args.admin_port, models=args.models.split(","),
+        ttft=args.ttft, prefill_ms=args.prefill_ms, rate=args.rate, jitter=args.jitter,
+        max_tokens=args.max_tokens, fail_rate=args.fail_rate, restart_time=args.restart,
+        context_length=args.context, seed=args.seed
+    ).start()
+    print(f"Stub serving {server.model} on {args.host}:{args.port} (admin :{args.admin_port})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ from pathlib import Path
 import os
 import json
 import shutil
+import persistence
 
 class ImageDropView(QGraphicsView):
     def __init__(self, parent=None, dummy_image=None):
@@ -260,8 +261,7 @@ class BotSettings(QMainWindow):
 
         json_path = bot_dir / "Bot Description.json"
 
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(json_data, f, indent=4)
+        persistence.writer.write_json(json_path, json_data)
 
         # -----------------------------
         # Copy portrait image
@@ -1,9 +1,14 @@
 import llmClient
+import chatStore
+import chatIndex
+import chatCatalog
+import sessionState
+import persistence
 
-from PySide6.QtWidgets import QMainWindow, QSizePolicy, QFileDialog
+from PySide6.QtWidgets import QMainWindow, QSizePolicy, QFileDialog, QListWidgetItem, QMessageBox
 from PySide6.QtUiTools import QUiLoader
-from PySide6.QtCore import QFile, Qt, QObject, QEvent
-from PySide6.QtGui import QTextCursor, QIcon
+from PySide6.QtCore import QFile, Qt, QObject, QEvent, QTimer
+from PySide6.QtGui import QTextCursor, QIcon, QTextBlockFormat, QTextCharFormat
 import json
 from pathlib import Path
 import os
@@ -40,27 +45,57 @@ class ShiftEnterFilter(QObject):
 
         return False                    # let Qt process other events
 
+GENERATING_MARK = " ⏳"
+PAGE_SIZE = 40          # messages rendered when a chat opens; older pages load on scroll-up
+SCROLL_MARGIN = 40      # px from the top that count as "at the top"
+
+# One converter, reset per message: building it is most of markdown()'s cost
+_markdown = markdown.Markdown(extensions=["fenced_code", "tables"])
+
 class ChatMain(QMainWindow):
+    # Per-chat state lives in the client's ChatContext so chats that are
+    # not shown can keep streaming and still be saved when they finish
+    chat_markdown = property(
+        lambda self: self.client.ctx.chat_markdown,
+        lambda self, value: setattr(self.client.ctx, "chat_markdown", value)
+    )
+    bot_path = property(
+        lambda self: self.client.ctx.bot_path,
+        lambda self, value: setattr(self.client.ctx, "bot_path", value)
+    )
+    response_start_time = property(
+        lambda self: self.client.ctx.response_start_time,
+        lambda self, value: setattr(self.client.ctx, "response_start_time", value)
+    )
+
     def __init__(self, pd, fd):
         super().__init__()
         self.isShowImgWindow = True
         self.isShowImgWindowLock = False
         self.isShowChatList = False
-        self.bot_path = None
         self.bot_desc_path = None
         self.botName =""
-        self.chat_markdown = []
         self.chat_path = None  # active chat file path
         self.directoryParent = pd
         self.directoryDefault = fd
+        self.session = sessionState.open_session(pd)
+        self.index = chatIndex.open_index(pd)
+        self.chat_catalog = chatCatalog.open_catalog(pd)
+        # Only chats changed since the catalog was written are parsed
+        self.chat_catalog.refresh(Path(pd) / "Save" / "Chat")
+        self.message_positions = {}   # message id → position in the chat view
+        self.rendered_from = 0        # chat_markdown index of the first rendered message
         self.response_cursor = None
         self.current_response = ""
-        self.response_start_time = time.time()
 
         self.client = llmClient.LLMClient(fd)
         self.client.token.connect(self.on_token)
         self.client.done.connect(self.on_done)
         self.client.error.connect(print)
+        self.client.background_done.connect(self.on_background_done)
+        self.client.generating_changed.connect(self.mark_generating)
+        self.client.dropped.connect(self.on_dropped)
+        self.client.switcher.state_changed.connect(self.on_switch_state)
 
         #self.setWindowIcon(QIcon((self.directoryParent + r"\Img\AppIcon.png")))
         self.load_ui()
@@ -68,6 +103,10 @@ class ChatMain(QMainWindow):
         # Store the initial stretch for the graphicsView column (e.g., 1)
         self.graphics_view_column_stretch = 1
 
+        # Catch up with chats changed while the app was closed
+        self.index.sync(Path(pd) / "Save" / "Chat")
+        QTimer.singleShot(chatCatalog.ARCHIVE_DELAY_MS, self.archive_cold_chats)
+
     def load_ui(self):
         """Load the UI file"""
         try:
@@ -104,6 +143,7 @@ class ChatMain(QMainWindow):
         self.ui.actionNew_Chat.setShortcut("Ctrl+N")
         self.ui.actionLoad_Chat.setShortcut("Ctrl+O")
         self.ui.actionChat_Settings.setShortcut("Ctrl+E")
+        self.ui.actionSearch_Chats.setShortcut("Ctrl+Shift+F")
 
         self.ui.pushButton_6.clicked.connect(self.regenerate_last_response) #regen
 
@@ -114,6 +154,13 @@ class ChatMain(QMainWindow):
         self.input = self.ui.plainTextEdit
         self._shift_filter = ShiftEnterFilter(self, self.input, parent=self)
         self.input.installEventFilter(self._shift_filter)
+        self.input.textChanged.connect(self.on_input_changed)
+        self.chat.verticalScrollBar().valueChanged.connect(self.on_chat_scrolled)
+
+    def on_input_changed(self):
+        # Typing started: let the client prefill the prompt prefix meanwhile
+        if self.input.toPlainText().strip():
+            self.client.typing()
 
     def on_token(self, text):
         if self.response_cursor is None:
@@ -151,18 +198,18 @@ class ChatMain(QMainWindow):
         end_time = time.time()
         response_time = end_time - self.response_start_time
 
-        msg = {
-            "role": "assistant",
-            "content": full_text,
+        # The reply dict is shared with the payload, so it is stored once on disk
+        msg = self.client.messages[-1]
+        msg.update({
             "ts": end_time,
-            "response_time": round(response_time, 2)
-        }
+            "response_time": round(response_time, 2),
+            "stats": self.client.ctx.response_stats
+        })
         self.chat_markdown.append(msg)
 
         ts = self.format_ts(msg["ts"])
-        rt = msg["response_time"]
         cursor.insertHtml(
-            f"<div style='color:#888;font-size:11px'>⏱ {rt}s · {ts}</div>"
+            f"<div style='color:#888;font-size:11px'>{self.format_stats(msg)} · {ts}</div>"
         )
 
         self.response_cursor = None
@@ -170,6 +217,55 @@ class ChatMain(QMainWindow):
 
         self.save_chat()
 
+    def on_background_done(self, key, full_text: str):
+        """A chat that is not on screen finished streaming: record and save it."""
+        ctx = self.client.contexts[key]
+        end_time = time.time()
+        msg = ctx.messages[-1]
+        msg.update({
+            "ts": end_time,
+            "response_time": round(end_time - ctx.response_start_time, 2),
+            "stats": ctx.response_stats
+        })
+        ctx.chat_markdown.append(msg)
+        self.save_chat(ctx)
+
+    def on_dropped(self, key, reason):
+        """A reply was cancelled by the app: take its question back and say so."""
+        ctx = self.client.contexts[key]
+        question = None
+        if ctx.chat_markdown and ctx.chat_markdown[-1]["role"] == "user":
+            question = ctx.chat_markdown.pop()
+        print(f"❌ Reply in {Path(key).stem} dropped: {reason}")
+
+        if ctx is not self.client.ctx:
+            self.save_chat(ctx)
+            return
+
+        # Partial reply and question leave the view; the question goes back into the input
+        self.response_cursor = None
+        self.current_response = ""
+        self._rebuild_chat_ui()
+        self.chat.append(
+            f"<div style='color:#888;font-size:11px'>Reply dropped: {reason}</div>"
+        )
+        if question is not None and not self.input.toPlainText().strip():
+            self.input.setPlainText(question["content"].replace("<br/>", "\n"))
+        self.save_chat()
+
+    def mark_generating(self, key, busy):
+        stem = Path(key).stem
+        for i in range(self.ui.listWidget.count()):
+            item = self.ui.listWidget.item(i)
+            if item.data(Qt.UserRole) == stem:
+                item.setText(stem + (GENERATING_MARK if busy else ""))
+
+    def on_switch_state(self, state):
+        if self.client.switcher.busy():
+            self.setWindowTitle(f"ChatUI - switching to {self.client.switcher.target} ({state})")
+        else:
+            self.setWindowTitle("ChatUI")
+
     def keyPressEvent(self, event):
         if self.input.hasFocus():
             if event.key() in (Qt.Key_Return, Qt.Key_Enter):
@@ -259,133 +355,102 @@ class ChatMain(QMainWindow):
         self.isShowChatList = True
         self.ui.pushButton.setEnabled(False)
 
-    def get_first_json_file_os(self,directory: str, recursive: bool = False):
-        """Using os module instead of pathlib"""
-        if not os.path.exists(directory):
-            print(f"Directory does not exist: {directory}")
-            return None
-
-        if not os.path.isdir(directory):
-            print(f"Path is not a directory: {directory}")
-            return None
-
-        if recursive:
-            # Walk through all subdirectories
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    if file.lower().endswith('.json'):
-                        return os.path.abspath(os.path.join(root, file))
-        else:
-            # Check only the given directory
-            for file in os.listdir(directory):
-                if file.lower().endswith('.json'):
-                    return os.path.abspath(os.path.join(directory, file))
-
-        print(f"No .json files found in: {directory}")
-        return None
-
     def get_lastChat(self):
-        logPath = Path(self.directoryParent) / "Save" / ".temp.json"
-        log = read_json_file(logPath)
-        return log["LastChat"]
+        return self.session.last_chat
 
     def update_lastChat(self, path):
-        logPath = Path(self.directoryParent) / "Save" / ".temp.json"
-        log = read_json_file(logPath)
-        log_new = log.copy()
-        log_new["LastChat"] = path
-
-        with open(logPath, "w", encoding="utf-8") as f:
-            json.dump(log_new, f, indent=4)
+        self.session.last_chat = path
 
     def load_chat(self, path):
         if path == "":
             savePath = Path(self.directoryParent) / "Save" / "Chat"
-            path = self.get_first_json_file_os(str(savePath))
+            path = self.chat_catalog.most_recent()
             if path is None:
+                print(f"No chats found in: {savePath}")
                 return
 
+        # One spelling per file, so a chat never gets two contexts
+        path = os.path.normpath(chatStore.chat_path(path))
+        chatHist = chatStore.store.load(path)
+        if chatHist is None:
+            print(f"❌ Cannot open chat: {path}")
+            return
         self.chat_path = path
-        chatHist = read_json_file(path)
 
         self.update_lastChat(path)
         self.ui.lineEdit.setText(chatHist["Name"])
+        self.rendered_from = 0     # nothing to page in while the view is cleared
         self.chat.clear()
+        self.response_cursor = None
 
-        self.chat_markdown = chatHist["Chat"]
-
-        logsPath = Path(self.directoryParent) / "Save" / ".temp.json"
-        logs = read_json_file(logsPath)
-        chat_path_str = Path(self.chat_path).stem
-
-        if chat_path_str in logs["ChatList"] and logs["ChatList"].index(chat_path_str) != len(logs["ChatList"])-1:
-            logs["ChatList"].remove(chat_path_str)
-        if chat_path_str not in logs["ChatList"]:
-            logs["ChatList"].append(chat_path_str)
+        # A chat that is still streaming keeps its in-memory state
+        ctx = self.client.activate(path)
+        streaming = ctx.generating()
+        if not streaming:
+            ctx.name = chatHist["Name"]
+            self.chat_markdown = chatHist["Chat"]
 
-        with open(logsPath, "w", encoding="utf-8") as f:
-            json.dump(logs, f, indent=4)
+        self.session.touch(Path(self.chat_path).stem)
 
         self.load_bot(chatHist["Bot Path"])
-        self.client.set_model(chatHist["Model"])
-        self.client.import_payload(chatHist["Payload"])
-        self.client.temperature = chatHist["Temperature"]
+        if not streaming:
+            self.client.set_model(chatHist["Model"])
+            self.client.import_payload(chatHist["Payload"], chat=self.chat_markdown)
+            self.client.import_summary(chatHist.get("Summary"))
+            self.client.temperature = chatHist["Temperature"]
 
+        generating = {Path(key).stem for key in self.client.generating_keys()}
         self.ui.listWidget.clear()
         self.ui.listWidget.addItem("Create New Chat [+]")
-        for chatFile in reversed(logs["ChatList"]):
-            self.ui.listWidget.addItem(chatFile)
-
-        for msg in self.chat_markdown:
+        for chatFile in reversed(self.session.chat_list()):
+            item = QListWidgetItem(chatFile + (GENERATING_MARK if chatFile in generating else ""))
+            item.setData(Qt.UserRole, chatFile)
+            self.ui.listWidget.addItem(item)
+
+        self._render_chat()
+
+        if streaming:
+            # Pick the reply up where it is; further tokens go to on_token
+            self.chat.append(f"<b>{self.botName}:</b>")
+            self.chat.moveCursor(QTextCursor.End)
+            self.response_cursor = self.chat.textCursor()
+            self.response_start_pos = self.response_cursor.position()
+            self.chat.insertPlainText(self.client.current_response)
+            self.current_response = self.client.current_response
+            return
 
-            ts = msg.get("ts")
-            time_str = f" <span style='color:#888'>[{self.format_ts(ts)}]</span>" if ts else ""
+        # No swap on open: the scheduler loads the model when this chat sends
+        if self.client.scheduler.needs_swap(self.client.model_name):
+            print(f"{self.client.model_name} is not loaded; it will be on the first message")
 
-            if msg["role"] == "user":
-                #self.chat.append("<b>You</b>:")
-
-                ts = self.format_ts(msg["ts"])
-                self.chat.append(f"\n<b>You</b>    <span style='color:#888'>[{ts}] </span>:")
-                text = msg['content']
-                text= text.replace(r"\n", "\n")
-                text = text.replace("\n", "<br/>")
-                self.chat.insertHtml(
-                    f"<div style='color:#ffffff; margin-left:12px;'>{text}</div>"
-                )
-
-            else:
-                self.chat.append(f"<b>{self.botName}</b>{time_str}: ")
-                self.chat.insertHtml(self.render_markdown(msg["content"]))
-
-                if "response_time" in msg:
-                    self.chat.insertHtml(
-                        f"<div style='color:#888;font-size:11px'>⏱ {msg['response_time']}s</div>"
-                    )
-
-            self.chat.append("")
-            self.client.get_model()
-
-        if self.client.model_name != self.client.get_model():
-            self.client.switch_model(self.client.model_name)
-
-    def save_chat(self):
-        if not self.chat_path:
+    def save_chat(self, ctx=None):
+        ctx = ctx or self.client.ctx
+        if not ctx.key:
             return
 
+        # The shown chat may have been renamed in the window
+        name = self.ui.lineEdit.text() if ctx is self.client.ctx else ctx.name
+        chatStore.assign_ids(ctx.chat_markdown)
+
         data = {
-            "Name": self.ui.lineEdit.text(),
-            "Bot Path": self.bot_path,
-            "Temperature": self.client.temperature,
-            "Model": self.client.model_name,
-            "Chat": self.chat_markdown,  # ✅ markdown only
-            "Payload": self.client.export_payload()
+            "Format": chatStore.CHAT_FORMAT,
+            "Name": name,
+            "Bot Path": ctx.bot_path,
+            "Temperature": ctx.temperature,
+            "Model": ctx.model_name,
+            "Chat": ctx.chat_markdown,  # ✅ markdown only
+            "Payload": self.client.export_payload(ctx),
+            "Summary": self.client.export_summary(ctx)
         }
 
+        # Only the change since the last save is appended to the chat's journal
         try:
-            with open(self.chat_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+            chatStore.store.save(ctx.key, data)
         except Exception as e:
             print(f"Save failed: {e}")
+            return
+        self.index.update(ctx.key, data)
+        self.chat_catalog.update(ctx.key, data)
 
     def load_bot(self,path):
         botJsonPath = path + "/Bot Description.json"
@@ -407,8 +472,23 @@ class ChatMain(QMainWindow):
             self.ui.pushButton.setEnabled(True)
         print("Img Window Lock: ", self.isShowImgWindowLock)
 
+    def confirm_swap(self):
+        """Ask before a turn forces the server to restart with another model."""
+        scheduler = self.client.scheduler
+        model = self.client.model_name
+        if not scheduler.needs_swap(model):
+            return True
+        answer = QMessageBox.question(
+            self,
+            "Switch model?",
+            scheduler.swap_notice(model) + "\n\nContinue?"
+        )
+        return answer == QMessageBox.Yes
+
     def sendMessage(self):
         text = self.input.toPlainText().strip()
+        if text and not self.confirm_swap():
+            return   # keep the draft
         self.input.clear()
 
         if not text:
@@ -440,23 +520,16 @@ class ChatMain(QMainWindow):
 
         self.current_response = ""
 
-        # Store markdown
-        msg = {
-            "role": "user",
-            "content": text,
-            "ts": self.now_ts()
-        }
+        # Store markdown (the same dict is the payload entry)
+        msg = self.client.add_user_message(text)
+        msg["ts"] = self.now_ts()
         self.chat_markdown.append(msg)
 
-        self.client.add_user_message(text)
         self.response_start_time = time.time()
         self.client.generate()
 
     def render_markdown(self, text: str) -> str:
-        html = markdown.markdown(
-            text,
-            extensions=["fenced_code", "tables"]
-        )
+        html = _markdown.reset().convert(text)
 
         return f"""
            <div style="
@@ -501,7 +574,7 @@ class ChatMain(QMainWindow):
 
     def edit_last_user_message(self, new_text: str):
         new_text = new_text.strip()
-        if not new_text:
+        if not new_text or not self.confirm_swap():
             return
 
         # ---- find last user message ----
@@ -522,6 +595,8 @@ class ChatMain(QMainWindow):
         # ---- update user message ----
         self.chat_markdown[user_index]["content"] = new_text
         self.chat_markdown[user_index]["ts"] = self.now_ts()
+        self.chat_markdown[user_index].pop("tokens", None)
+        self.client.count_tokens(self.chat_markdown[user_index])
 
         # ---- rebuild LLM + UI ----
         self._rebuild_llm_context()
@@ -542,8 +617,7 @@ class ChatMain(QMainWindow):
         self.current_response = ""
         self.response_start_time = time.time()
 
-        # ---- LLM request ----
-        self.client.add_user_message(new_text)
+        # ---- LLM request (the edited message was replayed above) ----
         self.client.generate()
 
         self.save_chat()
@@ -569,9 +643,17 @@ class ChatMain(QMainWindow):
         self.save_chat()
 
     def regenerate_last_response(self):
-        if not self.chat_markdown:
+        if not self.chat_markdown or not self.confirm_swap():
             return
 
+        # Free the server before asking it again; the window stays live while the socket closes
+        ctx = self.client.ctx
+        self.client.abort_then(lambda: self._regenerate(ctx), ctx)
+
+    def _regenerate(self, ctx):
+        if ctx is not self.client.ctx:
+            return      # another chat was opened meanwhile
+
         # Remove last assistant message if present
         if self.chat_markdown[-1]["role"] == "assistant":
             self.chat_markdown.pop()
@@ -595,50 +677,97 @@ class ChatMain(QMainWindow):
         self.response_cursor = self.chat.textCursor()
         self.response_start_pos = self.response_cursor.position()
         self.current_response = ""
+        self.response_start_time = time.time()
 
-        # ---- LLM ----
-        self.client.add_user_message(last_prompt)
+        # ---- LLM (the prompt was replayed above) ----
         self.client.generate()
 
     def _rebuild_llm_context(self):
-        # Hard reset payload messages
-        self.client.payload_messages = []
-
-        # Re-inject preset / system instruction
-        if getattr(self.client, "preset", None):
-            self.client.payload_messages.append({
-                "role": "system",
-                "content": self.client.preset
-            })
-
-        # Replay chat history
-        for msg in self.chat_markdown:
-            self.client.payload_messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
+        # Hard reset payload messages (the preset is added by the payload builder);
+        # they are the chat's own dicts, saved as refs
+        self.client.payload_messages = list(self.chat_markdown)
 
     def _rebuild_chat_ui(self):
+        self.rendered_from = 0
         self.chat.clear()
+        self._render_chat()
+
+    # ----------------------
+    # Paged rendering
+    # ----------------------
+    def _render_chat(self):
+        """Render the last PAGE_SIZE messages; older ones wait for load_older_messages()."""
+        self.rendered_from = max(len(self.chat_markdown) - PAGE_SIZE, 0)
+        self.message_positions = {}
+        cursor = QTextCursor(self.chat.document())
+        cursor.movePosition(QTextCursor.End)
+        for msg in self.chat_markdown[self.rendered_from:]:
+            self.message_positions[msg.get("id")] = cursor.position()
+            self._insert_message(cursor, msg)
+        self.chat.moveCursor(QTextCursor.End)
 
-        for msg in self.chat_markdown:
-            if msg["role"] == "user":
-                ts = msg.get("ts")
-                time_str = f"[{self.format_ts(ts)}]" if ts else ""
-
-                self.chat.append(
-                    f"<b>You</b> <span style='color:#888'>{time_str} </span>:"
-                )
-                self.chat.insertHtml(
-                    f"<div style='color:#ffffff; margin-left:12px;'>{msg['content']} </div>"
-                )
-            else:
-                self.chat.append(f"<b>{self.botName}:</b>")
-                self.chat.insertHtml(self.render_markdown(msg["content"]))
+    def _insert_message(self, cursor, msg):
+        """Write one message at `cursor`, followed by a blank line."""
+        ts = msg.get("ts")
+        time_str = f" <span style='color:#888'>[{self.format_ts(ts)}]</span>" if ts else ""
+
+        if msg["role"] == "user":
+            text = msg['content']
+            text = text.replace(r"\n", "\n")
+            text = text.replace("\n", "<br/>")
+            cursor.insertHtml(f"<b>You</b>{time_str}:")
+            cursor.insertBlock()
+            cursor.insertHtml(f"<div style='color:#ffffff; margin-left:12px;'>{text}</div>")
+        else:
+            cursor.insertHtml(f"<b>{self.botName}</b>{time_str}: ")
+            cursor.insertBlock()
+            cursor.insertHtml(self.render_markdown(msg["content"]))
+            if "response_time" in msg:
+                cursor.insertBlock()
+                cursor.insertHtml(f"<div style='color:#888;font-size:11px'>{self.format_stats(msg)}</div>")
+
+        # Plain blocks, so the next message does not inherit this one's style
+        cursor.insertBlock(QTextBlockFormat(), QTextCharFormat())
+        cursor.insertBlock(QTextBlockFormat(), QTextCharFormat())
+
+    def load_older_messages(self, until=None):
+        """
+        Render the page before the oldest rendered message (or everything
+        down to chat_markdown[until]) at the top, keeping the view still.
+        """
+        if self.rendered_from == 0:
+            return False
+        start = max(self.rendered_from - PAGE_SIZE, 0)
+        if until is not None:
+            start = min(start, until)
 
-            self.chat.append("")
+        doc = self.chat.document()
+        bar = self.chat.verticalScrollBar()
+        old_max, old_value = bar.maximum(), bar.value()
+        before = doc.characterCount()
 
-        self.chat.moveCursor(QTextCursor.End)
+        cursor = QTextCursor(doc)
+        positions = {}
+        for msg in self.chat_markdown[start:self.rendered_from]:
+            positions[msg.get("id")] = cursor.position()
+            self._insert_message(cursor, msg)
+
+        # Everything already shown moved down by what was inserted
+        shift = doc.characterCount() - before
+        for key in self.message_positions:
+            self.message_positions[key] += shift
+        positions.update(self.message_positions)
+        self.message_positions = positions
+        if self.response_cursor is not None:
+            self.response_start_pos += shift
+        self.rendered_from = start
+
+        bar.setValue(old_value + bar.maximum() - old_max)
+        return True
+
+    def on_chat_scrolled(self, value):
+        if value <= SCROLL_MARGIN and self.rendered_from > 0 and self.chat.verticalScrollBar().maximum() > 0:
+            self.load_older_messages()
 
     """
     def reset_context_for_new_model(self):
@@ -652,17 +781,74 @@ class ChatMain(QMainWindow):
     def format_ts(self, ts: float):
         return datetime.fromtimestamp(ts).strftime("%H:%M:%S")
 
+    def format_stats(self, msg):
+        """Timing line under a reply: total, first token, decode speed, token gaps and counts."""
+        parts = [f"⏱ {msg['response_time']}s"]
+        stats = msg.get("stats")
+        if stats:
+            parts.append(f"TTFT {stats['ttft']:.2f}s")
+            if stats["queue"] >= 0.01:
+                parts.append(f"queued {stats['queue']:.2f}s")
+            if stats["tokens_per_s"]:
+                parts.append(f"{stats['tokens_per_s']} tok/s")
+            parts.append(f"ITL p50 {stats['itl_p50_ms']:.0f} / p95 {stats['itl_p95_ms']:.0f} ms")
+            if stats["prompt_tokens"]:
+                parts.append(f"{stats['prompt_tokens']} → {stats['completion_tokens']} tok")
+            if stats.get("prefix_reuse"):
+                parts.append(f"prefix {stats['prefix_reuse']:.0%} reused")
+        return " · ".join(parts)
+
     def selectChat(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             "Select chat JSON",
             self.directoryParent+r"\Save\Chat",
-            "JSON Files (*.json)"
+            "Chat Files (*.json *.chatbin *.json.gz *.json.zst)"
         )
 
         if file_path:
             self.load_chat(file_path)
 
+    def jump_to_message(self, path, msg_id, text=""):
+        """Open the chat at `path` scrolled to message `msg_id`, with `text` selected in it."""
+        path = os.path.normpath(path)
+        if path != self.chat_path:
+            self.load_chat(path)
+        pos = self.message_positions.get(msg_id)
+        if pos is None:
+            index = next((i for i, msg in enumerate(self.chat_markdown) if msg.get("id") == msg_id), None)
+            if index is not None and self.load_older_messages(until=index):
+                pos = self.message_positions.get(msg_id)
+        if pos is None:
+            print(f"❌ Message {msg_id} is no longer in {Path(path).stem}")
+            return
+
+        doc = self.chat.document()
+        cursor = QTextCursor(doc)
+        cursor.setPosition(min(pos, doc.characterCount() - 1))
+        words = text.split()
+        if words:
+            found = doc.find(words[0], cursor)
+            if not found.isNull():
+                cursor = found
+        # From the end, so the message lands at the top of the view
+        self.chat.moveCursor(QTextCursor.End)
+        self.chat.setTextCursor(cursor)
+        self.chat.ensureCursorVisible()
+        self.show()
+        self.raise_()
+
+    def archive_cold_chats(self):
+        """Compress chats nobody touched for archiveAfterDays (config.json), except open ones."""
+        days = self.client.config.get("archiveAfterDays", chatCatalog.ARCHIVE_AFTER_DAYS)
+        open_chats = list(self.client.contexts) + [self.session.last_chat]
+        queued = self.chat_catalog.archive_cold(skip=[path for path in open_chats if path], days=days)
+        if queued:
+            print(f"Archiving {queued} cold chat(s)")
+        count, before, after = self.chat_catalog.savings()
+        if count:
+            print(f"✅ {count} archived chat(s): {before / 1e6:.1f} MB → {after / 1e6:.1f} MB on disk")
+
     def qs_chat(self, chatName):
         chatPath = Path(self.directoryParent + "//Save//Chat//" + chatName + ".json")
         self.load_chat(str(chatPath))
@@ -742,6 +928,7 @@ def read_json_file(file_path):
     try:
         # Convert to Path object for better handling
         json_path = Path(file_path)
+        persistence.writer.flush(json_path)     # a save of it may still be queued
 
         if not json_path.exists():
             print(f"❌ File not found in ChatUI: {file_path}")
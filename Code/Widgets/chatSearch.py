@@ -0,0 +1,95 @@
+from PySide6.QtWidgets import QMainWindow, QListWidgetItem
+from PySide6.QtUiTools import QUiLoader
+from PySide6.QtCore import QFile, Qt, QTimer, Signal
+from datetime import datetime
+import time
+
+import chatIndex
+
+SEARCH_DELAY_MS = 150      # search once typing pauses
+DAY = 24 * 3600
+RANGES = [None, "today", 7 * DAY, 30 * DAY, 365 * DAY]   # same order as the combo box
+
+
+class ChatSearch(QMainWindow):
+    """Full-text search over every saved chat; activating a hit opens the chat at that message."""
+    open_message = Signal(str, int, str)   # chat path, message id, search text
+
+    def __init__(self, pd, fd):
+        super().__init__()
+        self.ui = None
+        self.directoryParent = pd
+        self.directoryDefault = fd
+        self.index = chatIndex.open_index(pd)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(SEARCH_DELAY_MS)
+        self._timer.timeout.connect(self.search)
+
+        self.load_ui()
+        self.setup_connections()
+
+    def load_ui(self):
+        """Load the UI file"""
+        try:
+            ui_file = QFile(self.directoryDefault+r"\UI\Search Chats.ui")
+            if not ui_file.open(QFile.ReadOnly):
+                print(f"Cannot open UI file: {ui_file.errorString()}")
+                return
+
+            loader = QUiLoader()
+            self.ui = loader.load(ui_file)
+            ui_file.close()
+
+            if self.ui:
+                self.setCentralWidget(self.ui)
+                self.setWindowTitle("Search Chats")
+
+        except Exception as e:
+            print(f"Error loading UI: {e}")
+
+    def setup_connections(self):
+        self.ui.lineEdit.textChanged.connect(lambda _: self._timer.start())
+        self.ui.lineEdit.returnPressed.connect(self.search)
+        self.ui.comboBox.currentIndexChanged.connect(lambda _: self.search())
+        self.ui.listWidget.itemActivated.connect(self.activate)
+
+    def open(self):
+        self.show()
+        self.raise_()
+        self.ui.lineEdit.setFocus()
+        self.ui.lineEdit.selectAll()
+
+    def since(self):
+        span = RANGES[self.ui.comboBox.currentIndex()]
+        if span is None:
+            return None
+        if span == "today":
+            return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+        return time.time() - span
+
+    def search(self):
+        self._timer.stop()
+        text = self.ui.lineEdit.text().strip()
+        self.ui.listWidget.clear()
+        if not text:
+            self.ui.label.setText("")
+            return
+
+        start = time.perf_counter()
+        results = self.index.search(text, since=self.since())
+        elapsed = (time.perf_counter() - start) * 1000
+
+        for hit in results:
+            when = datetime.fromtimestamp(hit["ts"]).strftime("%Y-%m-%d %H:%M") if hit["ts"] else ""
+            who = "You" if hit["role"] == "user" else hit["role"].capitalize()
+            snippet = " ".join(hit["snippet"].split())
+            item = QListWidgetItem(f"{hit['name']} · {who} · {when}\n{snippet}")
+            item.setData(Qt.UserRole, (hit["path"], hit["msg_id"]))
+            self.ui.listWidget.addItem(item)
+        self.ui.label.setText(f"{len(results)} result(s) in {elapsed:.1f} ms")
+
+    def activate(self, item):
+        path, msg_id = item.data(Qt.UserRole)
+        self.open_message.emit(path, msg_id, self.ui.lineEdit.text().strip())
@@ -1,24 +1,37 @@
 from PySide6.QtGui import QPixmap
 from PySide6.QtWidgets import QMainWindow, QFileDialog, QGraphicsScene, QGraphicsPixmapItem, QLineEdit
 from PySide6.QtUiTools import QUiLoader
-from PySide6.QtCore import QFile, Qt
+from PySide6.QtCore import QFile, Qt, Signal
 import json
 from pathlib import Path
+import chatStore
+import chatIndex
+import chatCatalog
+import sessionState
+import persistence
 
 class ChatSettings(QMainWindow):
+    _models_loaded = Signal(object)   # model ids, emitted from the catalog's refresh thread
+
     def __init__(self, pd, fd):
         super().__init__()
         self.ui = None
         self.directoryParent = pd
         self.directoryDefault = fd
+        self.session = sessionState.open_session(pd)
+        self.index = chatIndex.open_index(pd)
+        self.chat_catalog = chatCatalog.open_catalog(pd)
         self.chatPath = ""
         self.chatName =""
         self.botSettingPath = ""
         self.scene = QGraphicsScene()
         self.chatHist =[]
         self.payload=[]
+        self.summary = None
+        self.modelCatalog = None
         self.load_ui()
         self.setup_connections()
+        self._models_loaded.connect(self.add_models)
         # Store the initial stretch for the graphicsView column (e.g., 1)
         self.graphics_view_column_stretch = 1
 
@@ -47,6 +60,27 @@ class ChatSettings(QMainWindow):
         """Connect button signals to functions"""
         self.ui.pushButton.clicked.connect(self.load_bot_dir)
 
+    def set_model_catalog(self, catalog):
+        self.modelCatalog = catalog
+        catalog.add_listener(lambda entries: self._models_loaded.emit([entry["id"] for entry in entries]))
+
+    def refresh_models(self):
+        """
+        Add the models the server reports to the preset list in the .ui file:
+        the cached list now, the rest once the background refresh is back.
+        """
+        if self.modelCatalog is None:
+            return
+        self.add_models(self.modelCatalog.peek_ids())
+        self.modelCatalog.refresh_soon()
+
+    def add_models(self, served):
+        combo = self.ui.comboBox
+        known = {combo.itemText(i) for i in range(combo.count())}
+        for model in served:
+            if model not in known:
+                combo.addItem(model)
+
     def load_bot_dir(self):
         folder_path = QFileDialog.getExistingDirectory(
             self,
@@ -114,20 +148,15 @@ class ChatSettings(QMainWindow):
             pass
 
     def update_lastChat(self, path):
-        logPath = Path(self.directoryParent) / "Save" / ".temp.json"
-        log = self.read_json_file(logPath)
-        log_new = log.copy()
-        log_new["LastChat"] = path
         print("Updating Last Chat Logs")
-        with open(logPath, "w", encoding="utf-8") as f:
-            json.dump(log_new, f, indent=4)
-        print(log_new)
+        self.session.last_chat = path
 
     def read_json_file(self, file_path):
         """Read a JSON file and return its contents"""
         try:
             # Convert to Path object for better handling
             json_path = Path(file_path)
+            persistence.writer.flush(json_path)     # a save of it may still be queued
 
             if not json_path.exists():
                 print(f"❌ File not found in Chat Settings: {file_path}")
@@ -150,9 +179,11 @@ class ChatSettings(QMainWindow):
     def del_json_file(self,file_path: str) -> bool:
         """Simple, safe deletion for your chat app"""
         try:
-            path = Path(file_path)
-            if path.exists() and path.suffix.lower() == '.json':
-                path.unlink()
+            path = Path(chatStore.chat_path(file_path))
+            if chatStore.chat_exists(path) and path.suffix.lower() == '.json':
+                chatStore.store.delete(path)
+                self.index.remove(path)
+                self.chat_catalog.remove(path)
                 return True
             return False
         except Exception as e:
@@ -197,9 +228,6 @@ class ChatSettings(QMainWindow):
         spin.blockSignals(False)
 
     def save_settings(self):
-        logsPath =Path(self.directoryParent) / "Save" / ".temp.json"
-        logs = self.read_json_file(logsPath)
-
         """
         if True:
             pass
@@ -216,38 +244,35 @@ class ChatSettings(QMainWindow):
 
         chat_dir = str(target_base) + '/' + chat_name
 
-        if self.chatPath == chat_dir:
-            chat_dir = Path(str(self.chatPath)+".json")
+        # A chat is known by its .json path whatever layout it is stored in
+        if self.chatPath != "" and Path(chatStore.chat_path(self.chatPath)) == Path(chat_dir+".json"):
+            chat_dir = Path(chat_dir+".json")
 
         else:
             if self.chatPath != "":
                 self.del_json_file(str(self.chatPath))
+                persistence.writer.flush(chatStore.chat_path(self.chatPath))
                 self.chatPath = chat_dir
 
-            if Path(chat_dir).exists():
-                chatName = Path(chat_dir).stem
+            # Name.json, Name.chatbin and an archived Name.json.gz/.zst all take the name
+            if chatStore.chat_exists(chat_dir+".json"):
+                chatName = Path(chat_dir).name
                 i=1
-                while  Path(chat_dir).exists():
+                while chatStore.chat_exists(chat_dir+".json"):
                     chatName_New =chatName + " ("+str(i)+")"
                     chat_dir = str(target_base) + '/' + chatName_New
                     i+=1
             chat_dir = Path(chat_dir+".json")
-            chat_dir_str = str(chat_dir.stem)
+        chat_dir_str = str(chat_dir.stem)
 
         print("Saving: ", chat_dir_str)
-        if chat_dir_str in logs["ChatList"] and logs["ChatList"].index(chat_dir_str) != len(logs["ChatList"])-1:
-            logs["ChatList"].remove(chat_dir_str)
-        if chat_dir_str not in logs["ChatList"]:
-            if self.chatName != "":
-                logs["ChatList"].remove(self.chatName)
-            logs["ChatList"].append(chat_dir_str)
-        logs["LastChat"]=str(chat_dir)
-        with open(logsPath, "w", encoding="utf-8") as f:
-            json.dump(logs, f, indent=4)
+        self.session.rename(self.chatName, chat_dir_str)
+        self.session.last_chat = chat_dir
         # -----------------------------
         # Create / overwrite JSON
         # -----------------------------
         json_data = {
+            "Format": chatStore.CHAT_FORMAT,
             "Name": chat_name,
             "Bot Path": self.botSettingPath,
             "Temperature": self.ui.doubleSpinBox.value(),
@@ -255,14 +280,18 @@ class ChatSettings(QMainWindow):
             "Chat": self.chatHist,
             "Payload":self.payload
         }
+        if self.summary:
+            json_data["Summary"] = self.summary
 
-        with open(chat_dir, "w", encoding="utf-8") as f:
-            json.dump(json_data, f, indent=4)
+        chatStore.store.write(chat_dir, json_data)
+        self.index.update(chat_dir, json_data)
+        self.chat_catalog.update(chat_dir, json_data)
 
         print("save success")
 
     def loadSettings(self, path):
         self.chatPath = path
+        self.refresh_models()
         if path == "":
             print("new chat settings")
             self.ui.lineEdit_2.setText("")
@@ -272,17 +301,21 @@ class ChatSettings(QMainWindow):
             self.ui.comboBox.setCurrentIndex(0)
             self.chatHist =[]
             self.payload = []
+            self.summary = None
             self.scene.clear()
         else:
             print("loading chat settings")
             print("path: ", path)
-            settings = self.read_json_file(path)
+            settings = chatStore.store.load(path)
             if settings is not None:
                 self.botSettingPath = settings["Bot Path"]
                 self.ui.lineEdit.setText(settings["Name"])
                 self.chatName = settings["Name"]
                 self.load_bot(self.botSettingPath)
                 self.ui.doubleSpinBox.setValue(settings["Temperature"])
+                if self.ui.comboBox.findText(settings["Model"]) < 0:
+                    self.ui.comboBox.addItem(settings["Model"])
                 self.ui.comboBox.setCurrentText(settings["Model"])
                 self.chatHist = settings["Chat"]
-                self.payload = settings["Payload"]
\ No newline at end of file
+                self.payload = settings["Payload"]
+                self.summary = settings.get("Summary")
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+Compact binary chat documents, lossless against the JSON ones.
+
+Top-level lists of dicts ("Chat", "Payload") are stored as tables: every
+record has a shape (its keys, in order) and each key of a shape is one
+column. A column is
+- text  → all strings as one UTF-8 blob plus character offsets
+- enum  → indexes into a few interned strings (roles)
+- int / float → packed 64-bit arrays
+- json  → anything else (stats dicts, mixed types) as one JSON array
+so loading is a handful of C-level decodes and slices instead of a JSON
+parse per message. Everything else goes into a small JSON header.
+
+    MAGIC | u32 header length | header JSON | (u32 length | section) ...
+"""
+import json
+import struct
+import sys
+from array import array
+from itertools import repeat
+
+# ======================
+# CONFIG
+# ======================
+MAGIC = b"CHATBIN\x01"
+ENUM_MAX = 255                     # distinct short strings a column may intern (roles, models)
+ENUM_MAX_LEN = 64
+
+_U32 = struct.Struct("<I")
+_INT_MIN, _INT_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _pack(arr):
+    if sys.byteorder == "big":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _unpack(typecode, data):
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+def _is_table(value):
+    return isinstance(value, list) and value and all(type(item) is dict for item in value)
+
+
+# ----------------------
+# Encode
+# ----------------------
+def _column(values, sections):
+    """Append the sections for one column; returns its header entry."""
+    types = {type(value) for value in values}
+    if types == {str}:
+        distinct = list(dict.fromkeys(values))
+        if len(distinct) <= ENUM_MAX and len(distinct) * 4 < len(values) \
+                and all(len(value) <= ENUM_MAX_LEN for value in distinct):
+            lookup = {value: i for i, value in enumerate(distinct)}
+            sections.append(_pack(array("B", [lookup[value] for value in values])))
+            return {"kind": "enum", "values": distinct}
+        offsets = array("Q", [0])
+        end = 0
+        for value in values:
+            end += len(value)
+            offsets.append(end)
+        sections.append(_pack(offsets))
+        sections.append("".join(values).encode("utf-8", "surrogatepass"))
+        return {"kind": "text"}
+    if types == {int} and _INT_MIN <= min(values) and max(values) <= _INT_MAX:
+        sections.append(_pack(array("q", values)))
+        return {"kind": "int"}
+    if types == {float}:
+        sections.append(_pack(array("d", values)))
+        return {"kind": "float"}
+    sections.append(json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+                    .encode("utf-8", "surrogatepass"))
+    return {"kind": "json"}
+
+
+def _table(records, sections):
+    shapes = {}
+    shape_ids = array("H")
+    for record in records:
+        shape_ids.append(shapes.setdefault(tuple(record), len(shapes)))
+    if len(shapes) > 0xFFFF:
+        raise ValueError("too many record shapes")
+    sections.append(_pack(shape_ids))
+
+    table = {"shapes": []}
+    for keys, shape in shapes.items():
+        members = [record for record, sid in zip(records, shape_ids) if sid == shape]
+        table["shapes"].append({"keys": list(keys), "count": len(members),
+                                "columns": [_column([record[key] for record in members], sections)
+                                            for key in keys]})
+    return table
+
+
+def dumps(doc):
+    """The binary form of a chat document (any JSON object)."""
+    header = {"order": list(doc), "values": {}, "tables": {}}
+    sections = []
+    for key, value in doc.items():
+        if _is_table(value):
+            header["tables"][key] = _table(value, sections)
+        else:
+            header["values"][key] = value
+    head = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8", "surrogatepass")
+    parts = [MAGIC, _U32.pack(len(head)), head]
+    for section in sections:
+        parts.append(_U32.pack(len(section)))
+        parts.append(section)
+    return b"".join(parts)
+
+
+# ----------------------
+# Decode
+# ----------------------
+class _Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def section(self):
+        if self.pos + 4 > len(self.data):
+            raise ValueError("truncated chat file")
+        size, = _U32.unpack_from(self.data, self.pos)
+        start = self.pos + 4
+        self.pos = start + size
+        if self.pos > len(self.data):
+            raise ValueError("truncated chat file")
+        return self.data[start:self.pos]
+
+
+def _read_column(column, reader):
+    kind = column["kind"]
+    if kind == "text":
+        offsets = _unpack("Q", reader.section()).tolist()
+        text = str(reader.section(), "utf-8", "surrogatepass")
+        return [text[a:b] for a, b in zip(offsets, offsets[1:])]
+    if kind == "enum":
+        values = column["values"]
+        return [values[i] for i in reader.section()]
+    if kind == "int":
+        return _unpack("q", reader.section()).tolist()
+    if kind == "float":
+        return _unpack("d", reader.section()).tolist()
+    if kind == "json":
+        return json.loads(str(reader.section(), "utf-8", "surrogatepass"))
+    raise ValueError(f"unknown column kind {kind!r}")
+
+
+def _read_table(table, reader):
+    shape_ids = reader.section()
+    shape_ids = _unpack("H", shape_ids) if len(table["shapes"]) > 1 else None
+    groups = []
+    for shape in table["shapes"]:
+        keys = shape["keys"]
+        columns = [_read_column(column, reader) for column in shape["columns"]]
+        # map() all the way down: no Python frame per record
+        groups.append(list(map(dict, map(zip, repeat(keys), zip(*columns)))) if keys
+                      else [{} for _ in range(shape["count"])])
+    if shape_ids is None:
+        return groups[0] if groups else []
+    iters = [iter(group) for group in groups]
+    return list(map(next, map(iters.__getitem__, shape_ids)))
+
+
+def loads(data):
+    """The chat document stored by dumps()."""
+    if not is_binary(data):
+        raise ValueError("not a binary chat file")
+    reader = _Reader(data)
+    reader.pos = len(MAGIC)
+    header = json.loads(str(reader.section(), "utf-8", "surrogatepass"))
+    tables = {key: _read_table(table, reader) for key, table in header["tables"].items()}
+    values = header["values"]
+    return {key: tables[key] if key in tables else values[key] for key in header["order"]}
+
+
+def is_binary(data):
+    return bytes(data[:len(MAGIC)]) == MAGIC
@@ -0,0 +1,243 @@
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QTimer
+
+import chatStore
+import persistence
+
+# ======================
+# CONFIG
+# ======================
+CATALOG_NAME = ".catalog.json"     # in Save/, next to .temp.json
+CATALOG_VERSION = 1
+FLUSH_DELAY_MS = 1000
+ARCHIVE_AFTER_DAYS = 30            # chats untouched this long are compressed (config.json "archiveAfterDays")
+ARCHIVE_DELAY_MS = 15000           # after start-up, so it never competes with it
+REQUIRED_KEYS = {"Name", "Bot Path", "Temperature", "Model", "Chat"}
+
+
+def _summary(path, doc):
+    """Catalog entry for a chat document saved at `path`."""
+    chat = doc.get("Chat", [])
+    size, mtime = chatStore.file_stat(path)
+    last = next((msg["ts"] for msg in reversed(chat) if msg.get("ts")), None)
+    return {
+        "name": doc.get("Name"),
+        "path": str(path),
+        "model": doc.get("Model"),
+        "bot": doc.get("Bot Path"),
+        "messages": len(chat),
+        "last_activity": last or mtime / 1e9,
+        "size": size,
+        "mtime": mtime
+    }
+
+
+class ChatCatalog(QObject):
+    """
+    Save/.catalog.json: one line of facts per chat (name, model, bot,
+    message count, last activity, size and mtime), so start-up and the
+    chat list never parse chat files.
+    - update(path, doc) / remove(path) → after a save or delete
+    - refresh(chat_dir) → re-reads only chats whose size or mtime changed
+    - has_chats() / entries() / most_recent()
+    - archive_cold(skip, days) → compresses chats idle for `days` (default ARCHIVE_AFTER_DAYS);
+      entries keep "archived", "size" and "original_size" (see savings())
+    Handed to persistence.writer FLUSH_DELAY_MS after the last change, and on exit.
+    """
+    def __init__(self, path):
+        super().__init__()
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.parsed = 0
+        self._dirty = False
+        self._chats = self._read()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(FLUSH_DELAY_MS)
+        self._timer.timeout.connect(self.flush)
+        atexit.register(self.flush)
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"❌ Chat catalog unreadable, rebuilding it: {e}")
+            return {}
+        if data.get("Version") != CATALOG_VERSION:
+            return {}
+        return data.get("Chats", {})
+
+    # ----------------------
+    # Queries
+    # ----------------------
+    def entries(self):
+        """Readable chats, most recent activity first."""
+        with self.lock:
+            chats = [entry for entry in self._chats.values() if "error" not in entry]
+        return sorted(chats, key=lambda entry: entry["last_activity"], reverse=True)
+
+    def get(self, path):
+        with self.lock:
+            return self._chats.get(os.path.normpath(str(path)))
+
+    def has_chats(self):
+        with self.lock:
+            return any("error" not in entry for entry in self._chats.values())
+
+    def most_recent(self):
+        entries = self.entries()
+        return entries[0]["path"] if entries else None
+
+    # ----------------------
+    # Updates
+    # ----------------------
+    def update(self, path, doc):
+        key = os.path.normpath(str(path))
+        entry = _summary(key, doc)
+        with self.lock:
+            self._chats[key] = entry
+        # The save may still be queued: take size and mtime once it is on disk
+        persistence.writer.submit(key, lambda: self._restat(key))
+        self.flush_soon()
+
+    def _restat(self, key):
+        size, mtime = chatStore.file_stat(key)
+        with self.lock:
+            entry = self._chats.get(key)
+            if entry is not None:
+                entry["size"], entry["mtime"] = size, mtime
+                self._dirty = True
+
+    def remove(self, path):
+        with self.lock:
+            found = self._chats.pop(os.path.normpath(str(path)), None)
+        if found is not None:
+            self.flush_soon()
+
+    def refresh(self, chat_dir):
+        """
+        Make the catalog match `chat_dir`: chats whose size or mtime changed
+        are read again, missing ones dropped. Returns how many were read.
+        """
+        chat_dir = os.path.normpath(str(chat_dir))
+        on_disk = set(chatStore.chat_files(chat_dir))
+
+        changed = False
+        parsed = 0
+        with self.lock:
+            for key in [key for key in self._chats if os.path.dirname(key) == chat_dir and key not in on_disk]:
+                del self._chats[key]
+                changed = True
+            stale = []
+            for key in on_disk:
+                entry = self._chats.get(key)
+                if entry is None or (entry["size"], entry["mtime"]) != chatStore.file_stat(key):
+                    stale.append(key)
+
+        for key in stale:
+            try:
+                doc = chatStore.store.read(key)
+                if not isinstance(doc, dict) or not REQUIRED_KEYS.issubset(doc):
+                    raise ValueError("not a chat file")
+                entry = _summary(key, doc)
+                archived = chatStore.archive_path(key)
+                if archived is not None:
+                    # Size it would take as JSON again; the archiving run's figure is gone
+                    entry["archived"] = chatStore.ARCHIVE_SUFFIXES[archived.suffix]
+                    entry["original_size"] = len(json.dumps(doc, indent=4, ensure_ascii=False).encode("utf-8"))
+            except Exception as e:
+                size, mtime = chatStore.file_stat(key)
+                entry = {"path": key, "size": size, "mtime": mtime, "error": str(e) or type(e).__name__}
+                print(f"❌ Skipping {Path(key).name}: {entry['error']}")
+            with self.lock:
+                self._chats[key] = entry
+            parsed += 1
+            changed = True
+
+        self.parsed += parsed
+        if changed:
+            self._dirty = True
+            self.flush()
+        return parsed
+
+    # ----------------------
+    # Archive
+    # ----------------------
+    def archive_cold(self, skip=(), days=ARCHIVE_AFTER_DAYS):
+        """Queue compressing every chat idle for `days`, except the paths in `skip`. Returns how many."""
+        cutoff = time.time() - days * 86400
+        skip = {os.path.normpath(str(path)) for path in skip}
+        with self.lock:
+            cold = [key for key, entry in self._chats.items()
+                    if "error" not in entry and "archived" not in entry
+                    and entry["last_activity"] < cutoff and key not in skip]
+        for key in cold:
+            chatStore.store.archive(key, then=lambda before, after, key=key: self._archived(key, before))
+        return len(cold)
+
+    def _archived(self, key, original_size):
+        size, mtime = chatStore.file_stat(key)
+        with self.lock:
+            entry = self._chats.get(key)
+            if entry is None:
+                return
+            entry.update(archived=chatStore.ARCHIVE_SUFFIXES[chatStore.archive_path(key).suffix],
+                         original_size=original_size, size=size, mtime=mtime)
+            self._dirty = True
+        # On the writer thread already: queue the catalog behind this chat
+        persistence.writer.submit(str(self.path), self._write, replaces=True)
+
+    def savings(self):
+        """(archived chats, bytes before, bytes now) over the archived chats."""
+        with self.lock:
+            archived = [entry for entry in self._chats.values() if "archived" in entry]
+        return (len(archived), sum(entry["original_size"] for entry in archived),
+                sum(entry["size"] for entry in archived))
+
+    # ----------------------
+    # Persistence
+    # ----------------------
+    def flush_soon(self):
+        self._dirty = True
+        self._timer.start()
+
+    def flush(self):
+        with self.lock:
+            if not self._dirty:
+                return
+        # Snapshot on the writer thread, after the chat writes queued before it
+        persistence.writer.submit(str(self.path), self._write, replaces=True)
+
+    def _write(self):
+        with self.lock:
+            if not self._dirty:
+                return
+            data = {"Version": CATALOG_VERSION, "Updated": time.time(),
+                    "Chats": {key: dict(entry) for key, entry in self._chats.items()}}
+            self._dirty = False
+        try:
+            persistence.write_json_atomic(self.path, data, indent=None)
+        except OSError as e:
+            self._dirty = True
+            print(f"❌ Could not save the chat catalog: {e}")
+
+
+_catalogs = {}
+
+
+def open_catalog(data_dir):
+    """The one ChatCatalog for `data_dir`/Save."""
+    path = os.path.normpath(str(Path(data_dir) / "Save" / CATALOG_NAME))
+    if path not in _catalogs:
+        _catalogs[path] = ChatCatalog(path)
+    return _catalogs[path]
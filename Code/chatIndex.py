@@ -0,0 +1,304 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import chatStore
+import persistence
+
+# ======================
+# CONFIG
+# ======================
+INDEX_NAME = "chats.db"            # next to Save/Chat; safe to delete, it is rebuilt
+SEARCH_LIMIT = 50
+SNIPPET_WORDS = 12
+SNIPPET_MARKS = ("[", "]")
+SYNC_BATCH = 200                   # chats per transaction while catching up
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    name TEXT,
+    model TEXT,
+    bot_path TEXT,
+    updated REAL,
+    signature TEXT
+);
+CREATE TABLE IF NOT EXISTS bots (
+    path TEXT PRIMARY KEY,
+    name TEXT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    chat_id INTEGER NOT NULL REFERENCES chats(id) ON DELETE CASCADE,
+    msg_id INTEGER NOT NULL,
+    role TEXT,
+    content TEXT,
+    ts REAL,
+    UNIQUE (chat_id, msg_id)
+);
+CREATE INDEX IF NOT EXISTS messages_ts ON messages(ts);
+"""
+
+# External-content FTS table kept in step with `messages` by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE OF content ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+    INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content);
+END;
+"""
+
+
+def fts5_available():
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def signature(path):
+    """Changes whenever the chat's base file or journal does."""
+    size, mtime = chatStore.file_stat(path)
+    return f"{mtime}:{size}"
+
+
+def fts_query(text):
+    """User text → FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _rows(doc):
+    """(msg id, role, content, ts) of the chat's messages, copied off the live dicts."""
+    return {msg["id"]: (msg["role"], msg["content"], msg.get("ts"))
+            for msg in doc.get("Chat", []) if "id" in msg}
+
+
+class ChatIndex:
+    """
+    SQLite mirror of every saved chat, for search across all of them.
+    The JSON chats stay the source of truth; the index can be deleted
+    and is rebuilt from them.
+    - update(path, doc) → after a save; only changed messages are rewritten
+    - remove(path)      → after a delete
+    - sync(chat_dir)    → re-indexes chats whose files changed while closed
+    - search(text, since=None, until=None) → best matches with a snippet
+    Writes run in order on one background thread; search reads on the
+    caller's thread (WAL lets both run at once).
+    """
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.fts = fts5_available()
+        if not self.fts:
+            print("❌ SQLite has no FTS5: chat search falls back to a slow scan")
+        self._local = threading.local()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ChatIndex")
+        self._known = {}             # chat path → {msg id: row} as indexed (writer thread only)
+        self.indexed_messages = 0
+        self._writer.submit(self._create).result()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _create(self):
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        if self.fts:
+            conn.executescript(FTS_SCHEMA)
+        conn.commit()
+
+    # ----------------------
+    # Updates (queued)
+    # ----------------------
+    def update(self, path, doc):
+        """Index what `doc` (just saved at `path`) holds now."""
+        path = os.path.normpath(str(path))
+        meta = (doc.get("Name"), doc.get("Model"), doc.get("Bot Path"))
+        return self._writer.submit(self._update, path, meta, _rows(doc))
+
+    def remove(self, path):
+        return self._writer.submit(self._remove, os.path.normpath(str(path)))
+
+    def sync(self, chat_dir):
+        """Bring the index up to date with `chat_dir`; returns a future of the count re-indexed."""
+        return self._writer.submit(self._sync, Path(chat_dir))
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+
+    def _update(self, path, meta, rows, sig=None, commit=True):
+        conn = self._conn()
+        name, model, bot_path = meta
+        if sig is None:
+            persistence.writer.flush(path)     # sign the file as saved, not as it was
+        try:
+            conn.execute(
+                "INSERT INTO chats(path, name, model, bot_path, updated, signature) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET name=excluded.name, model=excluded.model, "
+                "bot_path=excluded.bot_path, updated=excluded.updated, signature=excluded.signature",
+                (path, name, model, bot_path, time.time(), sig or signature(path))
+            )
+            chat_id = conn.execute("SELECT id FROM chats WHERE path = ?", (path,)).fetchone()[0]
+
+            known = self._known.get(path)
+            if known is None:
+                known = {msg_id: (role, content, ts) for msg_id, role, content, ts in conn.execute(
+                    "SELECT msg_id, role, content, ts FROM messages WHERE chat_id = ?", (chat_id,))}
+
+            gone = [(chat_id, msg_id) for msg_id in known if msg_id not in rows]
+            changed = [(chat_id, msg_id) + row for msg_id, row in rows.items() if known.get(msg_id) != row]
+            conn.executemany("DELETE FROM messages WHERE chat_id = ? AND msg_id = ?", gone)
+            conn.executemany(
+                "INSERT INTO messages(chat_id, msg_id, role, content, ts) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(chat_id, msg_id) DO UPDATE SET role=excluded.role, "
+                "content=excluded.content, ts=excluded.ts",
+                changed
+            )
+            if bot_path:
+                self._update_bot(conn, bot_path)
+            if commit:
+                conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            self._known.clear()      # a rollback may undo more than this chat
+            print(f"❌ Search index update failed for {Path(path).name}: {e}")
+            return 0
+        self._known[path] = rows
+        self.indexed_messages += len(changed)
+        return len(changed)
+
+    def _update_bot(self, conn, bot_path):
+        try:
+            with open(Path(bot_path) / "Bot Description.json", "r", encoding="utf-8") as f:
+                bot = json.load(f)
+        except (OSError, ValueError):
+            return
+        conn.execute("INSERT OR REPLACE INTO bots(path, name, description) VALUES (?, ?, ?)",
+                     (bot_path, bot.get("Name"), bot.get("Description")))
+
+    def _remove(self, path):
+        conn = self._conn()
+        conn.execute("DELETE FROM chats WHERE path = ?", (path,))
+        conn.commit()
+        self._known.pop(path, None)
+
+    def _sync(self, chat_dir):
+        conn = self._conn()
+        indexed = dict(conn.execute("SELECT path, signature FROM chats"))
+        on_disk = {os.path.normpath(path) for path in chatStore.chat_files(chat_dir)}
+        count = 0
+        for path in sorted(on_disk):
+            sig = signature(path)
+            if indexed.get(path) == sig:
+                continue
+            try:
+                doc = chatStore.store.read(path)
+            except Exception as e:
+                print(f"❌ Cannot index {Path(path).name}: {e}")
+                continue
+            chatStore.migrate(doc)     # ids as the chat will get them when opened
+            self._update(path, (doc.get("Name"), doc.get("Model"), doc.get("Bot Path")), _rows(doc), sig,
+                         commit=False)
+            self._known.pop(path, None)   # only chats being edited are kept in memory
+            count += 1
+            if count % SYNC_BATCH == 0:
+                conn.commit()
+        conn.commit()
+        for path in indexed:
+            if path not in on_disk and os.path.dirname(path) == os.path.normpath(str(chat_dir)):
+                self._remove(path)
+        if count:
+            print(f"✅ Search index: {count} chat(s) re-indexed")
+        return count
+
+    # ----------------------
+    # Search (caller's thread)
+    # ----------------------
+    def search(self, text, since=None, until=None, limit=SEARCH_LIMIT):
+        """
+        Messages matching every word of `text`, best first, optionally only
+        with since <= ts < until. Each result is a dict with path, name,
+        msg_id, role, ts and snippet.
+        """
+        conn = self._conn()
+        if self.fts:
+            query = fts_query(text)
+            if query is None:
+                return []
+            sql = (
+                "SELECT c.path, c.name, m.msg_id, m.role, m.ts, "
+                f"snippet(messages_fts, 0, ?, ?, '…', {SNIPPET_WORDS}) "
+                "FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid "
+                "JOIN chats c ON c.id = m.chat_id "
+                "WHERE messages_fts MATCH ? "
+                "AND (? IS NULL OR m.ts >= ?) AND (? IS NULL OR m.ts < ?) "
+                "ORDER BY rank LIMIT ?"
+            )
+            params = (*SNIPPET_MARKS, query, since, since, until, until, limit)
+        else:
+            words = re.findall(r"\w+", text)
+            if not words:
+                return []
+            sql = (
+                "SELECT c.path, c.name, m.msg_id, m.role, m.ts, substr(m.content, 1, 120) "
+                "FROM messages m JOIN chats c ON c.id = m.chat_id WHERE "
+                + " AND ".join("m.content LIKE ?" for _ in words) +
+                " AND (? IS NULL OR m.ts >= ?) AND (? IS NULL OR m.ts < ?) "
+                "ORDER BY m.ts DESC LIMIT ?"
+            )
+            params = (*(f"%{word}%" for word in words), since, since, until, until, limit)
+
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"❌ Search failed: {e}")
+            return []
+        return [{"path": path, "name": name, "msg_id": msg_id, "role": role, "ts": ts, "snippet": snippet}
+                for path, name, msg_id, role, ts, snippet in rows]
+
+    def stats(self):
+        conn = self._conn()
+        return {
+            "chats": conn.execute("SELECT count(*) FROM chats").fetchone()[0],
+            "messages": conn.execute("SELECT count(*) FROM messages").fetchone()[0],
+            "indexed_messages": self.indexed_messages,
+            "fts5": self.fts
+        }
+
+
+_indexes = {}
+
+
+def open_index(data_dir):
+    """The one ChatIndex for `data_dir`/Save."""
+    path = os.path.normpath(str(Path(data_dir) / "Save" / INDEX_NAME))
+    if path not in _indexes:
+        _indexes[path] = ChatIndex(path)
+    return _indexes[path]
@@ -0,0 +1,576 @@
+import gzip
+import io
+import json
+import os
+import threading
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import chatBinary
+import persistence
+
+# ======================
+# CONFIG
+# ======================
+JOURNAL_SUFFIX = ".journal"
+SEQ_KEY = "Journal Seq"            # last journal record folded into the base file
+COMPACT_MIN_BYTES = 256 * 1024     # journal size before compaction is considered...
+COMPACT_RATIO = 0.5                # ...once it is also this share of the base file
+COMPACT_MAX_RECORDS = 500          # bounds replay time on load
+
+# A chat's base is Name.json, or Name.chatbin in the binary layout (chatBinary);
+# rewrites keep whichever a chat has, Tools/convertChats.py switches
+BINARY_SUFFIX = ".chatbin"
+NEW_CHATS_BINARY = False           # layout of chats that have no file yet
+
+# Archived chats are one compressed file next to where the .json was
+ARCHIVE_SUFFIXES = {".zst": "zstd", ".gz": "gzip"}
+ARCHIVE_CODEC = "zstd" if zstandard is not None else "gzip"
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+# Format 2: each message is stored once in "Chat" with an "id"; "Payload"
+# holds {"ref": id} for those and inline entries only for payload-only text
+FORMAT_KEY = "Format"
+CHAT_FORMAT = 2
+
+_MISSING = object()
+
+
+def journal_path(path):
+    return Path(path).with_suffix(JOURNAL_SUFFIX)
+
+
+def binary_path(path):
+    return Path(path).with_suffix(BINARY_SUFFIX)
+
+
+def archive_path(path):
+    """The compressed file of an archived chat, or None."""
+    for suffix in ARCHIVE_SUFFIXES:
+        p = Path(str(path) + suffix)
+        if p.exists():
+            return p
+    return None
+
+
+def chat_path(path):
+    """The .json path a chat is known by, also when given its binary or archive file."""
+    path = str(path)
+    if path.lower().endswith(BINARY_SUFFIX):
+        return path[:-len(BINARY_SUFFIX)] + ".json"
+    for suffix in ARCHIVE_SUFFIXES:
+        if path.lower().endswith(".json" + suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def chat_exists(path):
+    return Path(path).exists() or binary_path(path).exists() or archive_path(path) is not None
+
+
+def chat_files(chat_dir):
+    """Every chat in `chat_dir` by its .json path, binary and archived ones included."""
+    try:
+        names = os.listdir(chat_dir)
+    except FileNotFoundError:
+        return []
+    paths = {chat_path(os.path.join(chat_dir, name)) for name in names}
+    return sorted(path for path in paths if path.lower().endswith(".json"))
+
+
+def open_archive(path):
+    """Text stream over an archived chat, decompressed as it is read."""
+    if Path(path).suffix == ".zst":
+        if zstandard is None:
+            raise IOError(f"{Path(path).name} is zstd-compressed and zstandard is not installed")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+def _write_archive(path, doc, codec):
+    """Compress `doc` to a temp file, fsync it and rename it into place. Returns the archive path."""
+    suffix = next(s for s, name in ARCHIVE_SUFFIXES.items() if name == codec)
+    target = Path(str(path) + suffix)
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, "wb") as raw:
+        if codec == "zstd":
+            stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+        else:
+            stream = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=GZIP_LEVEL, mtime=0)
+        with io.TextIOWrapper(stream, encoding="utf-8") as f:
+            json.dump(doc, f, indent=4, ensure_ascii=False)
+            f.flush()
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, target)
+    return target
+
+
+def _unlink_archives(path):
+    for suffix in ARCHIVE_SUFFIXES:
+        Path(str(path) + suffix).unlink(missing_ok=True)
+
+
+def _encode(doc, binary):
+    if binary:
+        return chatBinary.dumps(doc)
+    return json.dumps(doc, indent=4, ensure_ascii=False).encode("utf-8")
+
+
+def file_stat(path):
+    """(bytes, newest mtime in ns) of a chat's base file, journal and archive together."""
+    size = 0
+    mtime = 0
+    for p in (Path(path), binary_path(path), journal_path(path), *(Path(str(path) + suffix) for suffix in ARCHIVE_SUFFIXES)):
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        size += st.st_size
+        mtime = max(mtime, st.st_mtime_ns)
+    return size, mtime
+
+
+def assign_ids(chat):
+    """Give every message without one a stable id (never reused while the chat has it)."""
+    missing = [msg for msg in chat if "id" not in msg]
+    if not missing:
+        return
+    next_id = max((msg["id"] for msg in chat if "id" in msg), default=0) + 1
+    for msg in missing:
+        msg["id"] = next_id
+        next_id += 1
+
+
+def migrate(doc):
+    """
+    Format 1 → 2: Payload entries that repeat a Chat message become refs
+    to it; anything the Chat does not hold (preset, old summaries) stays inline.
+    Returns True if the document was changed.
+    """
+    if doc.get(FORMAT_KEY, 1) >= CHAT_FORMAT:
+        return False
+    chat = doc.get("Chat", [])
+    assign_ids(chat)
+
+    positions = {}
+    for i, msg in enumerate(chat):
+        positions.setdefault((msg["role"], msg["content"]), []).append(i)
+
+    payload = []
+    cursor = 0
+    for entry in doc.get("Payload", []):
+        if "ref" in entry:
+            payload.append(entry)
+            continue
+        # Payload follows Chat order: take the first unused match after the last one
+        match = next((i for i in positions.get((entry["role"], entry["content"]), ()) if i >= cursor), None)
+        if match is None:
+            payload.append(entry)
+            continue
+        msg = chat[match]
+        if "tokens" in entry and "tokens" not in msg:
+            msg["tokens"] = entry["tokens"]
+        payload.append({"ref": msg["id"]})
+        cursor = match + 1
+
+    doc["Payload"] = payload
+    doc[FORMAT_KEY] = CHAT_FORMAT
+    return True
+
+
+def _snapshot(doc):
+    """What was persisted: list entries are copied one level deep so in-place edits show up."""
+    return {key: [dict(item) if isinstance(item, dict) else item for item in value]
+            if isinstance(value, list) else value
+            for key, value in doc.items()}
+
+
+def _apply(doc, ops, copy=False):
+    """Replay journal ops onto doc; copy=True keeps doc independent of the ops' objects."""
+    for op in ops:
+        kind = op["op"]
+        if kind == "set":
+            doc.update(_snapshot(op["values"]) if copy else op["values"])
+        elif kind == "unset":
+            for key in op["keys"]:
+                doc.pop(key, None)
+        elif kind == "trunc":
+            del doc.setdefault(op["key"], [])[op["len"]:]
+        elif kind == "append":
+            items = op["items"]
+            if copy:
+                items = [dict(item) if isinstance(item, dict) else item for item in items]
+            doc.setdefault(op["key"], []).extend(items)
+
+
+def _diff(old, new):
+    """Journal ops turning `old` into `new`; lists only record their changed tail."""
+    ops = []
+    values = {}
+    for key, value in new.items():
+        before = old.get(key, _MISSING)
+        if isinstance(value, list) and isinstance(before, list):
+            common = 0
+            limit = min(len(before), len(value))
+            while common < limit and before[common] == value[common]:
+                common += 1
+            if common < len(before):
+                ops.append({"op": "trunc", "key": key, "len": common})
+            if common < len(value):
+                ops.append({"op": "append", "key": key, "items": value[common:]})
+        elif before is _MISSING or before != value:
+            values[key] = value
+    if values:
+        ops.insert(0, {"op": "set", "values": values})
+
+    removed = [key for key in old if key not in new]
+    if removed:
+        ops.append({"op": "unset", "keys": removed})
+    return ops
+
+
+class _Journal:
+    """Bookkeeping for one chat file: what is on disk and where the journal ends."""
+    def __init__(self, path):
+        self.key = os.path.normpath(str(path))     # persistence.writer queue
+        self.path = Path(path)
+        self.journal = journal_path(path)
+        self.binary = binary_path(path)
+        self.binary_base = NEW_CHATS_BINARY    # layout of the base file, as last read
+        self.lock = threading.Lock()
+        self.state = {}
+        self.seq = 0
+        self.records = 0
+        self.journal_bytes = 0
+        self.base_bytes = 0
+        self.compacting = False
+        self.archived = None    # archive file the state was read from; the next save unpacks it
+        self.generation = 0     # bumped by full rewrites; stale compactions give up
+
+
+    def base(self):
+        return self.binary if self.binary_base else self.path
+
+
+class ChatStore:
+    """
+    Chat files as a base JSON snapshot plus an append-only journal.
+    - load(path)        → base + replayed journal (plain old .json chats load as is)
+    - read(path)        → the same, read-only
+    - save(path, data)  → appends only what changed since the last load/save
+    - write(path, data) → full rewrite, journal dropped (new chats, settings)
+    - delete(path)      → base and journal
+    - archive(path)     → fold into one compressed file (cold chats); load and
+                          read decompress it, the next save turns it back into JSON
+    - convert(path, binary) → rewrite the base as .chatbin or .json
+    Writes go through persistence.writer: the caller's state is updated at
+    once and the disk catches up on the writer thread; load/read wait for a
+    file's pending writes first. A journal that grows past its base is folded
+    into a new base there too.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._journals = {}
+        self.appended_bytes = 0
+        self.compactions = 0
+        self.archived = 0
+
+    def _entry(self, path):
+        key = os.path.normpath(str(path))
+        with self.lock:
+            entry = self._journals.get(key)
+            if entry is None:
+                entry = self._journals[key] = _Journal(key)
+            return entry
+
+    # ----------------------
+    # Read
+    # ----------------------
+    def load(self, path):
+        """The chat document at `path`, or None if it cannot be read."""
+        entry = self._entry(path)
+        persistence.writer.flush(entry.key)
+        try:
+            with entry.lock:
+                doc, seq, records, end = self._read(entry, repair=True)
+                entry.state = _snapshot(doc)
+                entry.seq = seq
+                entry.records = records
+                entry.journal_bytes = end
+                entry.base_bytes = (entry.archived or entry.base()).stat().st_size
+        except FileNotFoundError:
+            print(f"❌ File not found in ChatUI: {path}")
+            return None
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"❌ Invalid JSON format: {e}")
+            return None
+        except Exception as e:
+            print(f"❌ Error reading file: {e}")
+            return None
+
+        if migrate(doc):
+            self.write(path, doc)
+            print(f"✅ Migrated {entry.path.name} to chat format {CHAT_FORMAT}")
+
+        print(f"✅ JSON loaded successfully from: {entry.path.name}")
+        return doc
+
+    def read(self, path):
+        """
+        The chat as saved, for readers that do not edit it (search index,
+        tools): nothing is repaired, migrated or remembered. Raises on errors.
+        """
+        entry = _Journal(path)
+        persistence.writer.flush(entry.key)
+        doc, _, _, _ = self._read(entry)
+        return doc
+
+    def _read(self, entry, repair=False):
+        """
+        (document, last seq, records replayed, journal bytes used).
+        A torn last record (crash mid-append) is ignored; with repair=True
+        the journal is cut back to the last whole record so appends stay valid.
+        """
+        doc = self._read_base(entry)
+        seq = doc.pop(SEQ_KEY, 0)
+
+        records = 0
+        end = 0
+        try:
+            with open(entry.journal, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return doc, seq, records, end
+
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            end += len(line)
+            if record["seq"] <= seq:
+                continue       # already in the base (compaction stopped half way)
+            _apply(doc, record["ops"])
+            seq = record["seq"]
+            records += 1
+
+        if end < len(data):
+            print(f"❌ Dropped a damaged journal record in {entry.journal.name}")
+            if repair:
+                with open(entry.journal, "r+b") as f:
+                    f.truncate(end)
+        return doc, seq, records, end
+
+    def _read_base(self, entry):
+        """The base document, from the .json, the .chatbin or the archive, whichever exists."""
+        try:
+            with open(entry.path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            entry.binary_base, entry.archived = False, None
+            return doc
+        except FileNotFoundError:
+            pass
+        try:
+            with open(entry.binary, "rb") as f:
+                data = f.read()
+            entry.binary_base, entry.archived = True, None
+            return chatBinary.loads(data)
+        except FileNotFoundError:
+            pass
+        archived = archive_path(entry.path)
+        if archived is None:
+            raise FileNotFoundError(str(entry.path))
+        with open_archive(archived) as f:
+            doc = json.load(f)
+        entry.archived = archived
+        return doc
+
+    # ----------------------
+    # Write
+    # ----------------------
+    def save(self, path, data):
+        """Append what changed since the file was last loaded or saved. Returns bytes written."""
+        entry = self._entry(path)
+        if not entry.state:
+            if not chat_exists(entry.path):
+                self.write(path, data)
+                return entry.base_bytes
+            if self.load(path) is None:
+                raise IOError(f"cannot journal onto unreadable {entry.path.name}")
+        if entry.archived is not None:
+            self.write(path, data)     # back from the archive as plain JSON
+            return entry.base_bytes
+
+        ops = _diff(entry.state, data)
+        if not ops:
+            return 0
+
+        with entry.lock:
+            entry.seq += 1
+            line = json.dumps({"seq": entry.seq, "ops": ops}, ensure_ascii=False, separators=(",", ":"))
+            raw = (line + "\n").encode("utf-8")
+            persistence.writer.append(entry.key, entry.journal, raw)
+            _apply(entry.state, ops, copy=True)
+            entry.records += 1
+            entry.journal_bytes += len(raw)
+            self.appended_bytes += len(raw)
+
+        self._maybe_compact(entry)
+        return len(raw)
+
+    def write(self, path, data):
+        """Replace the chat with `data` as a fresh base file and no journal."""
+        entry = self._entry(path)
+        with entry.lock:
+            entry.generation += 1
+            entry.state = _snapshot(data)
+            entry.seq = 0
+            entry.records = 0
+            entry.journal_bytes = 0
+            entry.compacting = False    # a queued compaction is dropped with the appends
+
+            doc = _snapshot(data)
+            base = entry.base()
+
+            def write():
+                entry.base_bytes = persistence.write_bytes_atomic(base, _encode(doc, base == entry.binary))
+                (entry.path if base == entry.binary else entry.binary).unlink(missing_ok=True)
+                entry.journal.unlink(missing_ok=True)
+                _unlink_archives(entry.path)
+            entry.archived = None
+            # Replaces the chat's pending appends: this document already holds them
+            persistence.writer.submit(entry.key, write, replaces=True)
+
+    def delete(self, path):
+        entry = self._entry(path)
+        with entry.lock:
+            entry.generation += 1
+
+            def unlink():
+                entry.path.unlink(missing_ok=True)
+                entry.binary.unlink(missing_ok=True)
+                entry.journal.unlink(missing_ok=True)
+                _unlink_archives(entry.path)
+            persistence.writer.submit(entry.key, unlink, replaces=True)
+        with self.lock:
+            self._journals.pop(os.path.normpath(str(path)), None)
+
+    def convert(self, path, binary):
+        """Rewrite the chat's base as .chatbin (binary=True) or .json, journal folded in. Returns its size."""
+        entry = self._entry(path)
+        persistence.writer.flush(entry.key)
+        with entry.lock:
+            doc, _, _, _ = self._read(entry)
+            entry.binary_base = binary
+        self.write(path, doc)
+        persistence.writer.flush(entry.key)
+        return entry.base_bytes
+
+    # ----------------------
+    # Archive
+    # ----------------------
+    def archive(self, path, codec=ARCHIVE_CODEC, then=None):
+        """
+        Queue compressing the chat (journal folded in) into one file.
+        then(bytes before, bytes after) runs on the writer thread once it is done.
+        """
+        entry = self._entry(path)
+        version = (entry.generation, entry.seq)
+        persistence.writer.submit(entry.key, lambda: self._archive(entry, version, codec, then))
+
+    def _archive(self, entry, version, codec, then):
+        if not (entry.path.exists() or entry.binary.exists()):
+            return      # already archived, or deleted
+        try:
+            before, _ = file_stat(entry.path)
+            doc, _, _, _ = self._read(entry)
+            target = _write_archive(entry.path, doc, codec)
+            with entry.lock:
+                if version != (entry.generation, entry.seq):
+                    target.unlink(missing_ok=True)
+                    return      # saved meanwhile: not cold any more
+                entry.base().unlink()
+                entry.journal.unlink(missing_ok=True)
+                entry.archived = target
+                entry.records = 0
+                entry.journal_bytes = 0
+                entry.base_bytes = target.stat().st_size
+        except Exception as e:
+            print(f"❌ Archiving {entry.path.name} failed: {e}")
+            return
+        self.archived += 1
+        if then is not None:
+            then(before, entry.base_bytes)
+
+    # ----------------------
+    # Compaction
+    # ----------------------
+    def _maybe_compact(self, entry):
+        big = entry.journal_bytes > COMPACT_MIN_BYTES and entry.journal_bytes > entry.base_bytes * COMPACT_RATIO
+        if entry.compacting or not (big or entry.records > COMPACT_MAX_RECORDS):
+            return
+        entry.compacting = True
+        persistence.writer.submit(entry.key, lambda: self._compact(entry))
+
+    def _compact(self, entry):
+        """
+        Fold the journal into a new base (on the writer thread, so no append
+        runs meanwhile). The base records the last seq it contains, so a
+        crash between the two renames only replays records that are then skipped.
+        """
+        try:
+            generation = entry.generation
+            doc, seq, _, end = self._read(entry)
+            doc[SEQ_KEY] = seq
+            base = entry.base()
+            tmp = base.with_name(base.name + ".compact")
+            with open(tmp, "wb") as f:
+                f.write(_encode(doc, entry.binary_base))
+                f.flush()
+                os.fsync(f.fileno())
+
+            with entry.lock:
+                if generation != entry.generation:
+                    tmp.unlink(missing_ok=True)
+                    return      # rewritten or deleted meanwhile
+                os.replace(tmp, base)
+                # Records appended while the base was written stay in the journal
+                with open(entry.journal, "rb") as f:
+                    f.seek(end)
+                    tail = f.read()
+                tmp_journal = entry.journal.with_name(entry.journal.name + ".tmp")
+                with open(tmp_journal, "wb") as f:
+                    f.write(tail)
+                os.replace(tmp_journal, entry.journal)
+                entry.journal_bytes = len(tail)
+                entry.records = tail.count(b"\n")
+                entry.base_bytes = base.stat().st_size
+            self.compactions += 1
+        except Exception as e:
+            print(f"❌ Compaction of {entry.path.name} failed: {e}")
+        finally:
+            entry.compacting = False
+
+    def stats(self):
+        with self.lock:
+            journals = list(self._journals.values())
+        return {
+            "chats": len(journals),
+            "journal_bytes": sum(e.journal_bytes for e in journals),
+            "appended_bytes": self.appended_bytes,
+            "compactions": self.compactions,
+            "archived": self.archived
+        }
+
+
+# One store per process: every window must see the same journal positions
+store = ChatStore()
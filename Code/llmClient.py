@@ -1,20 +1,168 @@
 import json
+import hashlib
 import threading
-import requests
+import random
 import time
-from PySide6.QtCore import Signal, QObject
+import requests
+from requests.adapters import HTTPAdapter
+from PySide6.QtCore import Signal, QObject, QTimer
 from pathlib import Path
+from streamEngine import StreamEngine
+from tokenCounter import TokenCounter, MESSAGE_OVERHEAD
+from modelCatalog import ModelCatalog
+from modelSwitcher import ModelSwitcher
+from modelScheduler import ModelScheduler
 
 # ======================
 # CONFIG
 # ======================
 #IP = "192.168.0.247"
+DEFAULT_IP = "127.0.0.1"         # used when config.json cannot be read
 PORT = "8000"
+ADMIN_PORT = "9000"
 
 
-MAX_CONTEXT_MESSAGES = 16
-SUMMARY_TRIGGER_COUNT = 24
+DEFAULT_CONTEXT_LENGTH = 8192    # used when /v1/models has no max_model_len
+RESPONSE_TOKEN_RESERVE = 2048    # room left for the reply
+NEXT_TURN_RESERVE = 512          # expected size of the next user message
 SUMMARY_MODEL_MAX_TOKENS = 512
+SUMMARY_PREFIX = "Conversation summary:\n"
+WINDOW_KEEP_RATIO = 0.6          # share of the budget kept when the window moves
+SUMMARY_WAIT_TIMEOUT = 1        # seconds a send waits for a background summary
+
+POOL_CONNECTIONS = 4     # distinct hosts kept (chat server + admin server)
+POOL_MAXSIZE = 8         # keep-alive sockets kept per host
+
+TOKEN_FLUSH_MS = 16      # one UI update per 60 Hz frame
+CANCEL_TIMEOUT = 5       # seconds to wait for an aborted stream to close
+
+PREWARM_ENABLED = True
+PREWARM_DEBOUNCE_MS = 400    # typing time before the prefix is prefilled
+PREWARM_CONTROL = 0.2        # share of turns left cold to measure the gain
+
+
+def hash_messages(messages):
+    """Stable fingerprint of the role/content of a message list."""
+    h = hashlib.sha256()
+    for msg in messages:
+        h.update(msg["role"].encode("utf-8"))
+        h.update(b"\x00")
+        h.update(msg["content"].encode("utf-8"))
+        h.update(b"\x01")
+    return h.hexdigest()
+
+
+class ChatContext:
+    """
+    Everything one chat needs to generate: its history, rolling summary
+    and the job streaming into it. Each open chat has its own context so
+    several chats can stream at the same time.
+    """
+    def __init__(self, key):
+        self.key = key                   # chat file path
+        self.model_name = None
+        self.temperature = 0.7
+        self.preset = ""                 # system role, immutable
+        self.messages = []               # visible chat
+        self.payload_messages = []       # full payload
+
+        # Rolling summary of payload_messages[:covered], saved with the chat
+        self.summary = {"text": "", "covered": 0, "hash": ""}
+        self.summary_status = "idle"     # idle / pending / running / done / failed
+        self.summary_ticket = 0
+        self.summary_future = None
+
+        # Last request sent, for the prefix-cache diagnostic
+        self.last_request = []
+        self.prefix_match = {}
+
+        self.job = None
+        self.queued = False              # waiting for the scheduler to load its model
+        self.current_response = ""
+
+        # Prefix prefill while typing; group is "warm" or "control" for the next turn
+        self.prewarm_key = ""
+        self.prewarm_group = None
+
+        # Latency breakdown of the last finished reply (GenerationJob.stats)
+        self.queued_at = 0.0
+        self.response_stats = {}
+
+        # Kept for the chat window so a background chat can be saved on done
+        self.chat_markdown = []
+        self.name = ""
+        self.bot_path = None
+        self.response_start_time = 0.0
+
+    def streaming(self):
+        return self.job is not None and not self.job.done() and not self.job.cancelled
+
+    def generating(self):
+        return self.queued or self.streaming()
+
+
+def _active(name):
+    """Attribute of the active ChatContext, exposed on LLMClient."""
+    return property(
+        lambda self: getattr(self.ctx, name),
+        lambda self, value: setattr(self.ctx, name, value)
+    )
+
+
+class TokenCoalescer(QObject):
+    """
+    Buffers streamed deltas and emits them joined, at most once per
+    interval, so the chat window relayouts per frame instead of per token.
+    """
+    flushed = Signal(str)
+
+    def __init__(self, interval_ms=TOKEN_FLUSH_MS, parent=None):
+        super().__init__(parent)
+        self._buffer = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+
+        self.tokens = 0
+        self.flushes = 0
+
+    def push(self, text: str):
+        self._buffer.append(text)
+        self.tokens += 1
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        self._timer.stop()
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self.flushes += 1
+        self.flushed.emit(text)
+
+    def clear(self):
+        """Drop buffered text without emitting it (aborted generation)."""
+        self._timer.stop()
+        self._buffer.clear()
+
+    def stats(self):
+        return {
+            "tokens": self.tokens,
+            "flushes": self.flushes,
+            "tokens_per_flush": round(self.tokens / self.flushes, 2) if self.flushes else 0.0
+        }
+
+
+def _reuse(sent, connections):
+    reused = max(sent - connections, 0)
+    return {
+        "requests": sent,
+        "connections": connections,
+        "reused": reused,
+        "reuse_ratio": round(reused / sent, 3) if sent else 0.0
+    }
 
 
 class LLMClient(QObject):
@@ -22,28 +170,85 @@ class LLMClient(QObject):
     done = Signal(str)
     error = Signal(str)
     model_changed = Signal(str)
+    background_done = Signal(str, str)     # chat key, full text (chat not shown)
+    generating_changed = Signal(str, bool) # chat key, streaming or not
+    dropped = Signal(str, str)             # chat key, reason: reply cancelled by the app, question taken back
+
+    # The active chat's state, as used by the chat window
+    model_name = _active("model_name")
+    temperature = _active("temperature")
+    preset = _active("preset")
+    messages = _active("messages")
+    payload_messages = _active("payload_messages")
+    summary = _active("summary")
+    current_response = _active("current_response")
+    prefix_match = _active("prefix_match")
+
+    # Emitted from the engine loop thread, delivered queued on the UI thread
+    _job_token = Signal(int, str)
+    _job_done = Signal(int, str)
+    _job_error = Signal(int, str)
+    _job_dropped = Signal(int, str)
+    _call = Signal(object)           # callable to run on the UI thread
 
     def __init__(self,fd):
         super().__init__()
-        self.model_name = None
-        self.temperature = 0.7
+        # One context per open chat; ctx is the one shown in the window
+        self.contexts = {}
+        self.ctx = ChatContext("")
+        self._jobs = {}
 
         self.directoryDefault = fd
-        IP = self.read_json_file(str(self.directoryDefault) + r"\UI\config.json")
-        self.ip = IP["ip"]
+        IP = self.read_json_file(str(self.directoryDefault) + r"\UI\config.json") or {}
+        self.config = IP
         self.port = PORT
-        self.VLLM_URL = f"http://{self.ip}:{self.port}/v1/chat/completions"
-        self.MODELS_URL = f"http://{self.ip}:{self.port}/v1/models"
-        self.ADMIN_URL = f"http://{self.ip}:9000/admin/switch_model"
-        
-        self.preset = ""                 # system role, immutable
-        self.messages = []               # visible chat
-        self.payload_messages = []       # full payload
+        self.admin_port = ADMIN_PORT
+
+        # One pooled keep-alive transport shared by every call
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(
+            pool_connections=POOL_CONNECTIONS,
+            pool_maxsize=POOL_MAXSIZE
+        )
+        self.session.mount("http://", self._adapter)
+        self._retired_pool_stats = {"requests": 0, "connections": 0}
+        self.catalog = ModelCatalog(self.session, "")
+
+        # Coalesce per-delta tokens into one UI update per frame
+        self.coalescer = TokenCoalescer(IP.get("tokenFlushMs", TOKEN_FLUSH_MS), self)
+        self.coalescer.flushed.connect(self.token)
+
+        # Token counts are cached on each message under "tokens"
+        self.tokens = TokenCounter()
+
+        # Prefill the known prefix while the user types; some turns stay cold as a control
+        self.prewarm_enabled = IP.get("prewarm", PREWARM_ENABLED)
+        self.prewarm_control = IP.get("prewarmControl", PREWARM_CONTROL)
+        self._prewarm_timer = QTimer(self)
+        self._prewarm_timer.setSingleShot(True)
+        self._prewarm_timer.setInterval(IP.get("prewarmDebounceMs", PREWARM_DEBOUNCE_MS))
+        self._prewarm_timer.timeout.connect(self.prewarm)
+        self.ttft_samples = {"warm": [], "control": [], "cold": []}
 
-        self.current_response = ""
         self.lock = threading.Lock()
 
-        self._abort_flag = False
+        # One asyncio loop streams every generation; only each chat's newest job may emit
+        self._job_token.connect(self._on_job_token)
+        self._job_done.connect(self._on_job_done)
+        self._job_error.connect(self._on_job_error)
+        self._job_dropped.connect(self._on_job_dropped)
+        self._call.connect(self._run_call)
+        self.engine = StreamEngine(
+            self._job_token.emit,
+            self._job_done.emit,
+            self._job_error.emit
+        )
+        self.set_server(IP.get("ip", DEFAULT_IP))
+
+        # Model switches run on the engine loop; the scheduler decides when
+        self.switcher = ModelSwitcher(self)
+        self.switcher.switched.connect(self._on_model_switched)
+        self.scheduler = ModelScheduler(self)
 
     def read_json_file(self, file_path):
         """Read a JSON file and return its contents"""
@@ -72,204 +277,722 @@ class LLMClient(QObject):
     # ----------------------
     # Configuration
     # ----------------------
+    def activate(self, key):
+        """Make the chat at `key` the one shown; returns its (possibly new) context."""
+        if key not in self.contexts:
+            self.contexts[key] = ChatContext(key)
+        if self.ctx is not self.contexts[key]:
+            # Buffered tokens belong to the chat being left
+            self.coalescer.clear()
+        self.ctx = self.contexts[key]
+        return self.ctx
+
+    def generating_keys(self):
+        return [key for key, ctx in self.contexts.items() if ctx.generating()]
+
     def set_model(self, model: str):
         self.model_name = model
 
     def set_preset(self, text: str):
         self.preset = text.strip()
 
+    def set_server(self, ip: str, port=PORT, admin_port=ADMIN_PORT):
+        """Point the client at a (new) server and pre-connect to it."""
+        self.ip = ip.strip()
+        self.port = port
+        self.admin_port = admin_port
+        self.VLLM_URL = f"http://{self.ip}:{self.port}/v1/chat/completions"
+        self.MODELS_URL = f"http://{self.ip}:{self.port}/v1/models"
+        self.ADMIN_URL = f"http://{self.ip}:{self.admin_port}/admin/switch_model"
+        self.catalog.set_url(self.MODELS_URL)
+
+        # Drop sockets to the previous host, keep their counters
+        stats = self._side_pool_stats()
+        self._retired_pool_stats = {
+            "requests": stats["requests"],
+            "connections": stats["connections"]
+        }
+        self._adapter.poolmanager.clear()
+
+        self.preconnect()
+
+    # ----------------------
+    # Connection pool
+    # ----------------------
+    def preconnect(self):
+        """
+        Open keep-alive sockets in the background so the first turn skips the
+        handshake: one on the stream pool (generations) and one on the
+        requests session (models, summaries).
+        """
+        self.engine.preconnect(self.MODELS_URL)
+        threading.Thread(target=self._preconnect, daemon=True).start()
+
+    def _preconnect(self):
+        try:
+            self.session.get(self.MODELS_URL, timeout=2).close()
+        except requests.RequestException as e:
+            print(f"❌ Pre-connect to {self.ip} failed: {e}")
+
+    def pool_stats(self):
+        """
+        Requests sent vs sockets opened, over both pools; everything else
+        was a reused connection. "stream" and "side" break it down per pool.
+        """
+        side = self._side_pool_stats()
+        engine = self.engine.pool_stats()
+        stream = _reuse(engine["requests"], engine["connections"])
+        total = _reuse(side["requests"] + stream["requests"], side["connections"] + stream["connections"])
+        return dict(total, stream=stream, side=side)
+
+    def _side_pool_stats(self):
+        requests_sent = self._retired_pool_stats["requests"]
+        connections = self._retired_pool_stats["connections"]
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent += pool.num_requests
+            connections += pool.num_connections
+        return _reuse(requests_sent, connections)
+
     # ----------------------
     # Chat API
     # ----------------------
-    def add_user_message(self, text: str):
+    def add_user_message(self, text: str, tokens=None, ctx=None):
+        ctx = ctx or self.ctx
         with self.lock:
             msg = {"role": "user", "content": text}
-            self.messages.append(msg)
-            self.payload_messages.append(msg)
-
-    def generate(self):
-        if not self.model_name:
+            if tokens is not None:
+                msg["tokens"] = tokens
+            self.tokens.count_message(msg)
+            ctx.messages.append(msg)
+            ctx.payload_messages.append(msg)
+        return msg
+
+    def count_tokens(self, msg):
+        """Token count of a message dict, cached on it under "tokens"."""
+        return self.tokens.count_message(msg)
+
+    def generate(self, ctx=None):
+        ctx = ctx or self.ctx
+        if not ctx.model_name:
             self.error.emit("No model selected")
             return
 
-        self._abort_flag = False
-        self.current_response = ""
-        """
-        if self.preset:
-            if not self.payload_messages or self.payload_messages[0]["role"] != "system":
-                self.payload_messages.insert(0, {
-                    "role": "system",
-                    "content": self.preset
-                })
-        """
+        # A new generation always supersedes the previous one of the same chat
+        self.abort_generation(ctx=ctx)
+        ctx.current_response = ""
+
+        # Sent right away if the server serves the chat's model, else queued by model
+        ctx.queued = True
+        ctx.queued_at = time.perf_counter()
+        self.generating_changed.emit(ctx.key, True)
+        self.scheduler.submit(
+            ctx.model_name,
+            lambda: self._start_generation(ctx),
+            interactive=True,
+            tag=ctx.key,
+            on_drop=lambda reason: self._on_generation_dropped(ctx, reason)
+        )
+        return None if ctx.queued else ctx.job
+
+    def _start_generation(self, ctx):
+        ctx.queued = False
+
+        # Freeze the request on the UI thread; summarizing happens on the engine
+        msgs = list(ctx.payload_messages)
+        for msg in msgs:
+            self.tokens.count_message(msg)
+        model = ctx.model_name
+        temperature = ctx.temperature
+
+        def build_request():
+            return {
+                "model": model,
+                "messages": self._build_payload(ctx, msgs),
+                "temperature": temperature,
+                "stream": True,
+                # Server token counts arrive in a final usage chunk
+                "stream_options": {"include_usage": True}
+            }
+
+        ctx.job = self.engine.submit(self.VLLM_URL, build_request)
+        ctx.job.queue_time = ctx.job.submitted - ctx.queued_at
+        self._jobs[ctx.job.id] = ctx
+        return ctx.job
+
+    def _on_generation_dropped(self, ctx, reason):
+        ctx.queued = False
+        self.generating_changed.emit(ctx.key, False)
+        self.error.emit(f"Could not load {ctx.model_name}: {reason}")
+
+    def _context_of(self, job_id):
+        """The chat a job streams into, or None if the job was superseded."""
+        ctx = self._jobs.get(job_id)
+        if ctx is None or ctx.job is None or ctx.job.id != job_id or ctx.job.cancelled:
+            return None
+        return ctx
+
+    def _on_job_token(self, job_id, text):
+        ctx = self._context_of(job_id)
+        if ctx is None:
+            return
+        ctx.current_response += text
+        if ctx is self.ctx:
+            self.coalescer.push(text)
+
+    def _on_job_done(self, job_id, text):
+        ctx = self._context_of(job_id)
+        self._jobs.pop(job_id, None)
+        if ctx is None:
+            return
+
+        with self.lock:
+            msg = {"role": "assistant", "content": text}
+            self.tokens.count_message(msg)
+            ctx.messages.append(msg)
+            ctx.payload_messages.append(msg)
+
+        ctx.current_response = text
+        ctx.response_stats = ctx.job.stats()
+        if ctx.response_stats:
+            self._record_ttft(ctx, ctx.response_stats["ttft"])
+            if ctx.prefix_match:
+                ctx.response_stats["prefix_reuse"] = ctx.prefix_match["ratio"]
+        self.generating_changed.emit(ctx.key, False)
+        if ctx is self.ctx:
+            # Everything streamed must be on screen before done replaces it
+            self.coalescer.flush()
+            self.done.emit(text)
+        else:
+            self.background_done.emit(ctx.key, text)
 
-        threading.Thread(
-            target=self._stream_request,
-            daemon=True
-        ).start()
+        # Messages leaving the window next turn are known now: summarize them early
+        self.schedule_summary(ctx)
+
+    def _on_job_error(self, job_id, text):
+        ctx = self._context_of(job_id)
+        self._jobs.pop(job_id, None)
+        if ctx is None:
+            return
+        self.generating_changed.emit(ctx.key, False)
+        if ctx is self.ctx:
+            self.coalescer.flush()
+        if "404" in text:
+            # Model not found: it was changed outside the app; learn what is served now
+            self.catalog.invalidate()
+            self.catalog.refresh_soon()
+        self.error.emit(text)
+
+    def _on_job_dropped(self, job_id, reason):
+        """A stream the app cancelled itself (e.g. drained for a model switch)."""
+        ctx = self._jobs.pop(job_id, None)
+        if ctx is None or ctx.job is None or ctx.job.id != job_id:
+            return
+        with self.lock:
+            # The unanswered question leaves the history, so the next send is not a second user turn
+            if ctx.messages and ctx.messages[-1]["role"] == "user":
+                question = ctx.messages.pop()
+                if ctx.payload_messages and ctx.payload_messages[-1] is question:
+                    ctx.payload_messages.pop()
+        ctx.current_response = ""
+        if ctx is self.ctx:
+            self.coalescer.clear()
+        self.generating_changed.emit(ctx.key, False)
+        self.dropped.emit(ctx.key, reason)
 
     # ----------------------
     # Context logic
     # ----------------------
-    def _build_payload(self):
+    def _build_payload(self, ctx, msgs, record=True):
+        """
+        Laid out for vLLM prefix caching: preset, then a summary that only
+        moves at window boundaries, then history that only grows, so each
+        request shares its prefix with the previous one.
+        """
         payload = []
 
         # 1️⃣ Preset (never summarized)
-        if self.preset:
+        if ctx.preset:
             payload.append({
                 "role": "system",
-                "content": self.preset
+                "content": ctx.preset
             })
 
-        # 2️⃣ Summarize ONLY payload_messages
-        msgs = list(self.payload_messages)
-
-        if len(msgs) > SUMMARY_TRIGGER_COUNT:
-            summary = self._summarize(msgs[:-MAX_CONTEXT_MESSAGES])
+        # 2️⃣ Summary of everything before the window, then the window itself
+        summary, covered = self._summary_for(ctx, msgs, self._history_budget(ctx))
+        if summary:
             payload.append({
                 "role": "system",
-                "content": f"Conversation summary:\n{summary}"
+                "content": SUMMARY_PREFIX + summary
             })
-            payload.extend(msgs[-MAX_CONTEXT_MESSAGES:])
-        else:
-            payload.extend(msgs)
+        payload.extend(msgs[covered:])
 
+        # Only role/content go on the wire; ts, tokens etc. stay local
+        payload = [{"role": m["role"], "content": m["content"]} for m in payload]
+        if record:
+            self._record_prefix_match(ctx, payload)
         return payload
 
-    def _summarize(self, messages):
-        payload = {
-            "model": self.model_name,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": (
-                        "Summarize the conversation. Preserve goals, constraints, "
-                        "technical details. Be concise."
-                    )
-                },
-                *messages
-            ],
-            "temperature": 0.3,
-            "max_tokens": SUMMARY_MODEL_MAX_TOKENS,
-            "stream": False
+    def _history_budget(self, ctx):
+        """Tokens available for summary + history once preset and reply are reserved."""
+        budget = self.get_context_length(ctx.model_name) - RESPONSE_TOKEN_RESERVE
+        if ctx.preset:
+            budget -= self.tokens.count(ctx.preset) + MESSAGE_OVERHEAD
+        return max(budget, 0)
+
+    def _boundary_budget(self, budget):
+        """History kept right after the window moves; the rest is left to grow into."""
+        return int(budget * WINDOW_KEEP_RATIO) - SUMMARY_MODEL_MAX_TOKENS - MESSAGE_OVERHEAD
+
+    def _tokens_of(self, msgs):
+        return sum(self.tokens.count_message(m) for m in msgs)
+
+    def _window_start(self, msgs, budget):
+        """Index of the oldest message such that msgs[index:] fits in budget."""
+        total = 0
+        for i in range(len(msgs) - 1, -1, -1):
+            total += self.tokens.count_message(msgs[i])
+            if total > budget:
+                # The newest message is always sent, even if it alone is too big
+                return min(i + 1, len(msgs) - 1)
+        return 0
+
+    def _fits(self, msgs, state, budget, reserve=0):
+        """True if the stored summary still applies and summary + window fit in budget."""
+        covered = state["covered"]
+        if covered > len(msgs):
+            return False
+        if covered and hash_messages(msgs[:covered]) != state["hash"]:
+            return False
+
+        used = self._tokens_of(msgs[covered:]) + reserve
+        if state["text"]:
+            used += self.tokens.count(SUMMARY_PREFIX + state["text"]) + MESSAGE_OVERHEAD
+        return used <= budget
+
+    def _summary_for(self, ctx, msgs, budget):
+        """
+        (summary text, number of messages it replaces) for this turn.
+        The stored summary is kept for as long as the growing window fits;
+        only when it overflows does the window jump forward to a new boundary.
+        """
+        with self.lock:
+            state = dict(ctx.summary)
+            busy = ctx.summary_status in ("pending", "running")
+            future = ctx.summary_future
+
+        if self._fits(msgs, state, budget):
+            return state["text"], state["covered"]
+
+        if busy and future is not None:
+            # A background update is moving the boundary right now: use it if it lands soon
+            try:
+                future.result(SUMMARY_WAIT_TIMEOUT)
+            except Exception:
+                pass
+            with self.lock:
+                state = dict(ctx.summary)
+            if self._fits(msgs, state, budget):
+                return state["text"], state["covered"]
+            if not future.done():
+                return self._interim_summary(msgs, state, budget)
+
+        start = self._window_start(msgs, self._boundary_budget(budget))
+        return self._rolling_summary(ctx, msgs[:start]), start
+
+    def _interim_summary(self, msgs, state, budget):
+        """
+        While the background summary is still running: the last completed
+        summary (if it still applies) and as many recent messages as fit.
+        """
+        covered = state["covered"]
+        if not state["text"] or covered > len(msgs) or \
+                (covered and hash_messages(msgs[:covered]) != state["hash"]):
+            return "", self._window_start(msgs, budget)
+        budget -= self.tokens.count(SUMMARY_PREFIX + state["text"]) + MESSAGE_OVERHEAD
+        return state["text"], max(covered, self._window_start(msgs, budget))
+
+    def _record_prefix_match(self, ctx, payload):
+        """Diagnostic: leading tokens shared with the previous request (what vLLM can reuse)."""
+        previous = ctx.last_request
+        matched = 0
+        for old, new in zip(previous, payload):
+            if old == new:
+                matched += self.tokens.count(new["content"]) + MESSAGE_OVERHEAD
+                continue
+            if old["role"] == new["role"]:
+                common = 0
+                limit = min(len(old["content"]), len(new["content"]))
+                while common < limit and old["content"][common] == new["content"][common]:
+                    common += 1
+                if common:
+                    matched += self.tokens.count(new["content"][:common])
+            break
+
+        total = sum(self.tokens.count(m["content"]) + MESSAGE_OVERHEAD for m in payload)
+        ctx.last_request = payload
+        ctx.prefix_match = {
+            "matched_tokens": matched,
+            "prompt_tokens": total,
+            "ratio": round(matched / total, 3) if total else 0.0
         }
 
-        r = requests.post(self.VLLM_URL, json=payload, timeout=300)
-        r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"]
+    # ----------------------
+    # Prefix prewarm
+    # ----------------------
+    def typing(self):
+        """The user is writing the next message; prefill its prefix once the debounce expires."""
+        if self.prewarm_enabled:
+            # start() restarts a running timer: it fires once typing pauses
+            self._prewarm_timer.start()
+
+    def prewarm(self, ctx=None):
+        """
+        Send the next turn's prefix (preset, summary, history) with
+        max_tokens=1 so vLLM has it in its prefix cache when the user
+        presses Enter. Once per prefix; never queued behind a model swap.
+        """
+        ctx = ctx or self.ctx
+        if ctx.generating() or not ctx.model_name:
+            return None
+        if self.scheduler.needs_swap(ctx.model_name):
+            return None
+
+        msgs = list(ctx.payload_messages)
+        for msg in msgs:
+            self.tokens.count_message(msg)
+        key = ctx.model_name + hash_messages([{"role": "system", "content": ctx.preset}] + msgs)
+        if key == ctx.prewarm_key:
+            return None
+        ctx.prewarm_key = key
+
+        if random.random() < self.prewarm_control:
+            ctx.prewarm_group = "control"
+            return None
+        ctx.prewarm_group = "warm"
+
+        model = ctx.model_name
+
+        def build_request():
+            return {
+                "model": model,
+                "messages": self._build_payload(ctx, msgs, record=False),
+                "max_tokens": 1,
+                "stream": False
+            }
+
+        future = self.engine.request(self.VLLM_URL, build_request)
+        future.add_done_callback(self._on_prewarm_done)
+        return future
+
+    def _on_prewarm_done(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"❌ Prewarm failed: {future.exception()}")
+
+    def _record_ttft(self, ctx, ttft):
+        """Time to first token per prewarm group; the control group is the baseline."""
+        group = ctx.prewarm_group or "cold"
+        ctx.prewarm_group = None
+        self.ttft_samples[group].append(ttft)
+
+        line = f"TTFT {ttft * 1000:.0f} ms ({group})"
+        report = self.prewarm_report()
+        if report["warm"]["n"] and report["control"]["n"]:
+            line += (f" · warm {report['warm']['mean_ms']} ms (n={report['warm']['n']})"
+                     f" vs control {report['control']['mean_ms']} ms (n={report['control']['n']})")
+        print(line)
+
+    def prewarm_report(self):
+        report = {}
+        for group, samples in self.ttft_samples.items():
+            ordered = sorted(samples)
+            report[group] = {
+                "n": len(samples),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 1) if samples else None,
+                "median_ms": round(ordered[len(ordered) // 2] * 1000, 1) if samples else None
+            }
+        return report
 
     # ----------------------
-    # Streaming
+    # Background summary
     # ----------------------
-    def _stream_request(self):
-        payload = {
-            "model": self.model_name,
-            "messages": self._build_payload(),
-            "temperature": self.temperature,
-            "stream": True
-        }
+    def schedule_summary(self, ctx=None):
+        """Move the window boundary in the background if the next turn would overflow it."""
+        ctx = ctx or self.ctx
+        msgs = list(ctx.payload_messages)
+        for msg in msgs:
+            self.tokens.count_message(msg)
 
+        with self.lock:
+            ctx.summary_ticket += 1
+            ticket = ctx.summary_ticket
+            ctx.summary_status = "pending"
+            ctx.summary_future = None
+
+        def start():
+            with self.lock:
+                if ticket != ctx.summary_ticket:
+                    return None     # superseded while it waited for its model
+                ctx.summary_future = self.engine.run_background(self._background_summary, ctx, msgs, ticket)
+                return ctx.summary_future
+
+        # Background work: runs whenever the chat's model is loaded, never forces a swap
+        self.scheduler.submit(ctx.model_name, start)
+        return ctx.summary_future
+
+    def _background_summary(self, ctx, msgs, ticket):
+        self._set_summary_status(ctx, ticket, "running")
         try:
-            with requests.post(
-                self.VLLM_URL,
-                json=payload,
-                stream=True,
-                timeout=600
-            ) as r:
-                for line in r.iter_lines():
-                    if self._abort_flag:
-                        return
-
-                    if not line or not line.startswith(b"data: "):
-                        continue
-
-                    data = line[6:]
-                    if data == b"[DONE]":
-                        break
-
-                    chunk = json.loads(data)
-                    delta = chunk["choices"][0]["delta"]
-                    if "content" in delta:
-                        self.current_response += delta["content"]
-                        self.token.emit(delta["content"])
-
+            budget = self._history_budget(ctx)
+            with self.lock:
+                state = dict(ctx.summary)
+            if not self._fits(msgs, state, budget, NEXT_TURN_RESERVE):
+                start = self._window_start(msgs, self._boundary_budget(budget))
+                self._rolling_summary(ctx, msgs[:start])
         except Exception as e:
-            self.error.emit(str(e))
+            print(f"❌ Background summary failed: {e}")
+            self._set_summary_status(ctx, ticket, "failed")
             return
+        self._set_summary_status(ctx, ticket, "done")
+
+    def _set_summary_status(self, ctx, ticket, status):
+        with self.lock:
+            # Only the newest scheduled job reports its progress
+            if ticket == ctx.summary_ticket:
+                ctx.summary_status = status
+
+    def summary_status(self, ctx=None):
+        ctx = ctx or self.ctx
+        with self.lock:
+            return ctx.summary_status
 
+    def _rolling_summary(self, ctx, older):
+        """
+        Summary of `older`, reusing the stored one when it covers a prefix
+        of it: only messages that left the window since are sent to the model.
+        """
         with self.lock:
-            msg = {"role": "assistant", "content": self.current_response}
-            self.messages.append(msg)
-            self.payload_messages.append(msg)
+            state = dict(ctx.summary)
+
+        covered = state["covered"]
+        if state["text"] and covered <= len(older) and hash_messages(older[:covered]) == state["hash"]:
+            if covered == len(older):
+                return state["text"]
+            text = self._summarize_in_chunks(ctx, older[covered:], state["text"])
+        else:
+            # History before the window was edited or deleted: start over
+            text = self._summarize_in_chunks(ctx, older)
+
+        with self.lock:
+            ctx.summary = {
+                "text": text,
+                "covered": len(older),
+                "hash": hash_messages(older)
+            }
+        return text
+
+    def _summarize_in_chunks(self, ctx, messages, previous=""):
+        """Fold messages into the summary in pieces that fit the model's context."""
+        budget = self.get_context_length(ctx.model_name) - 2 * SUMMARY_MODEL_MAX_TOKENS - 4 * MESSAGE_OVERHEAD - 64
+        chunk = []
+        total = 0
+        for msg in messages:
+            tokens = self.tokens.count_message(msg)
+            if chunk and total + tokens > budget:
+                previous = self._summarize(ctx, chunk, previous)
+                chunk = []
+                total = 0
+            chunk.append(msg)
+            total += tokens
+        if chunk:
+            previous = self._summarize(ctx, chunk, previous)
+        return previous
+
+    def _summarize(self, ctx, messages, previous=""):
+        instructions = [{
+            "role": "system",
+            "content": (
+                "Summarize the conversation. Preserve goals, constraints, "
+                "technical details. Be concise."
+            )
+        }]
+        if previous:
+            instructions = [{
+                "role": "system",
+                "content": (
+                    "Update the existing summary with the new messages. Preserve goals, "
+                    "constraints, technical details. Be concise. Reply with the full "
+                    f"updated summary only.\n\nExisting summary:\n{previous}"
+                )
+            }]
+
+        messages = instructions + [{"role": m["role"], "content": m["content"]} for m in messages]
+        payload = {
+            "model": ctx.model_name,
+            "messages": messages,
+            "temperature": 0.3,
+            "max_tokens": SUMMARY_MODEL_MAX_TOKENS,
+            "stream": False
+        }
 
-        self.done.emit(self.current_response)
+        r = self.session.post(self.VLLM_URL, json=payload, timeout=300)
+        r.raise_for_status()
+        q = r.json()
+        self.tokens.calibrate(messages, q.get("usage", {}).get("prompt_tokens"))
+        return q["choices"][0]["message"]["content"]
 
     # ----------------------
     # Persistence helpers
     # ----------------------
-    def export_payload(self):
-        """Full payload sent to LLM (including preset)."""
+    def export_payload(self, ctx=None):
+        """
+        Full payload sent to LLM (including preset). Messages that are also
+        in the chat (they carry its "id") are saved as {"ref": id}.
+        """
+        ctx = ctx or self.ctx
         payload = []
-        if self.preset:
+        if ctx.preset:
             payload.append({
                 "role": "system",
-                "content": self.preset
+                "content": ctx.preset
             })
-        payload.extend(self.payload_messages)
+        for msg in ctx.payload_messages:
+            payload.append({"ref": msg["id"]} if "id" in msg else msg)
         return payload
 
 
-    def import_payload(self, payload):
-        """Restore payload from disk."""
-        self.messages.clear()
-        self.payload_messages.clear()
-        #self.preset = ""
+    def export_summary(self, ctx=None):
+        ctx = ctx or self.ctx
+        with self.lock:
+            return dict(ctx.summary)
 
-        for msg in payload:
-            if msg["role"] == "system" and not self.preset:
-                self.preset = msg["content"]
+    def import_summary(self, summary, ctx=None):
+        """Restore the rolling summary saved with a chat (or reset it)."""
+        ctx = ctx or self.ctx
+        with self.lock:
+            ctx.summary_ticket += 1
+            ctx.summary_status = "idle"
+            if summary:
+                ctx.summary = {
+                    "text": summary.get("text", ""),
+                    "covered": summary.get("covered", 0),
+                    "hash": summary.get("hash", "")
+                }
             else:
-                self.payload_messages.append(msg)
+                ctx.summary = {"text": "", "covered": 0, "hash": ""}
+
+    def import_payload(self, payload, ctx=None, chat=None):
+        """Restore payload from disk; {"ref": id} entries become the chat's own message dicts."""
+        ctx = ctx or self.ctx
+        ctx.messages.clear()
+        ctx.payload_messages.clear()
+        #self.preset = ""
+        by_id = {msg["id"]: msg for msg in chat or [] if "id" in msg}
+
+        for i, msg in enumerate(payload):
+            if "ref" in msg:
+                msg = by_id.get(msg["ref"])
+                if msg is None:
+                    print(f"❌ Payload refers to a missing chat message: {payload[i]['ref']}")
+                    continue
+            if i == 0 and msg["role"] == "system":
+                # export_payload() writes the preset first; the bot file's preset wins
+                if not ctx.preset:
+                    ctx.preset = msg["content"]
+            else:
+                self.tokens.count_message(msg)
+                ctx.payload_messages.append(msg)
                 if msg["role"] in ("user", "assistant"):
-                    self.messages.append(msg)
+                    ctx.messages.append(msg)
 
     # ----------------------
     # Switch Models
     # ----------------------
-    def request_model_switch(self, model_name: str):
-        r = requests.post(
-            self.ADMIN_URL,
-            params={"model": model_name},
-            timeout=5
-        )
-        r.raise_for_status()
+    def abort_then(self, fn, ctx=None):
+        """
+        Cancel the chat's generation without blocking; fn() runs on the UI
+        thread once its connection is closed (right away if nothing runs).
+        """
+        ctx = ctx or self.ctx
+        job = ctx.job
+        self.abort_generation(ctx=ctx)
+        if job is None or job.done():
+            fn()
+            return
+        job.add_done_callback(lambda _: self._call.emit(fn))
 
-    def abort_generation(self):
-        self._abort_flag = True
+    def _run_call(self, fn):
+        fn()
 
-    def wait_for_server_ready(self, timeout=120):
-        deadline = time.time() + timeout
-        while time.time() < deadline:
-            try:
-                r = requests.get(self.MODELS_URL, timeout=2)
-                if r.ok:
-                    return True
-            except requests.RequestException:
-                pass
-            time.sleep(1)
-        raise RuntimeError("LLM server did not come back online")
+    def abort_generation(self, wait=False, ctx=None):
+        """
+        Cancel the chat's running generation. With wait=True, block until
+        its connection is closed so the server has released the sequence.
+        Returns the cancel latency in seconds when it is known.
+        """
+        ctx = ctx or self.ctx
+        if ctx is self.ctx:
+            self.coalescer.clear()
+        if ctx.queued:
+            # Not sent yet: just take it out of the scheduler's queue
+            self.scheduler.discard(ctx.key)
+            ctx.queued = False
+            self.generating_changed.emit(ctx.key, False)
+            return None
+        job = ctx.job
+        if job is None or (job.done() and not job.cancelled):
+            return None
+
+        if not job.cancelled:
+            job.cancel()
+            self.generating_changed.emit(ctx.key, False)
+        if not wait:
+            return None
+
+        if not job.wait_cancelled(CANCEL_TIMEOUT):
+            print(f"❌ Generation {job.id} did not cancel within {CANCEL_TIMEOUT}s")
+            return None
+        print(f"Generation {job.id} cancelled in {job.cancel_latency * 1000:.1f} ms")
+        return job.cancel_latency
+
+    def abort_all(self, wait=False):
+        """Cancel every chat's generation (e.g. before the server restarts)."""
+        for ctx in list(self.contexts.values()):
+            self.abort_generation(wait, ctx)
+
+    def close(self):
+        """Stop all background work and close both pools; the client is done afterwards."""
+        self._prewarm_timer.stop()
+        self.abort_all()
+        self.engine.close()
+        self.session.close()
 
     def switch_model(self, model_name: str):
-        self.abort_generation()
-        self.request_model_switch(model_name)
-        self.wait_for_server_ready()
-        #reset server context
-        self.model_name = model_name
+        """
+        Start switching the server to model_name and return immediately.
+        Progress is reported by self.switcher (state_changed / switched / failed).
+        """
+        return self.switcher.switch(model_name)
+
+    def _on_model_switched(self, model_name, timings):
+        # The switcher left the catalog with the list the new server reported
+        phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items())
+        print(f"Switched to {model_name}: {phases}")
+        self.model_changed.emit(model_name)
+
+    def get_context_length(self, model=None):
+        """max_model_len of a model as reported by vLLM (from the catalog)."""
+        model = model or self.model_name
+        try:
+            length = self.catalog.context_length(model)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"❌ Could not read context length: {e}")
+            length = None
+        return length or DEFAULT_CONTEXT_LENGTH
 
     def get_model(self):
-        r = requests.get(self.MODELS_URL, timeout=2)
-        q = r.json()
-        #print(q)
-        model_name = q['data'][0]["id"]
-        #print(model_name)
-        return model_name
\ No newline at end of file
+        """Model the server is serving (cached for MODEL_CATALOG_TTL seconds)."""
+        return self.catalog.current()
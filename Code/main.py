@@ -4,50 +4,12 @@ import json
 import time
 from pathlib import Path
 
-from typing import Set, Optional
-
-from PySide6.QtCore import QStandardPaths, QCoreApplication
+from PySide6.QtCore import QStandardPaths, QCoreApplication, Qt
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QIcon
-from Widgets import chatMain, chatSettings, botSettings, warningWidget
-
-SETTINGS_KEYS = {"Name", "Bot Path", "Temperature", "Model", "Chat"}
-def find_json_with_format(
-        target_folder: str,
-        required_keys: Set[str],
-        file_extension: str = ".json",
-        recursive: bool = False
-) -> Optional[Path]:
-    """
-    Same as above but returns the Path of the first matching file.
-    Returns None if no match is found.
-    """
-    folder_path = Path(target_folder)
-
-    if not folder_path.exists():
-        print("No such directory")
-        return None
-    if not folder_path.is_dir():
-        print("This is not a directory")
-        return None
-
-    search_method = folder_path.rglob if recursive else folder_path.glob
-
-    for file_path in search_method(f"*{file_extension}"):
-        #print(file_path)
-        if not file_path.is_file():
-            continue
-
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            if isinstance(data, dict) and required_keys.issubset(data.keys()):
-                return file_path
-        except (json.JSONDecodeError, UnicodeDecodeError, PermissionError):
-            continue
-
-    return None
+from Widgets import chatMain, chatSettings, botSettings, warningWidget, chatSearch
+import sessionState
+import persistence
 
 def read_json_file(file_path):
     """Read a JSON file and return its contents"""
@@ -86,6 +48,9 @@ class Main:
         mainChat.ui.actionSet_IP.triggered.connect(self.openIPSettings)
         mainChat.ui.actionCreate_New_Chara.triggered.connect(self.newBot)
         mainChat.ui.actionEdit_Chara.triggered.connect(self.loadBot)
+        mainChat.ui.actionSearch_Chats.triggered.connect(searchChats.open)
+
+        searchChats.open_message.connect(mainChat.jump_to_message)
 
         settingsChat.ui.pushButton_2.clicked.connect(self.newBot)
         settingsChat.ui.pushButton_3.clicked.connect(self.cancelChatSettings)
@@ -104,6 +69,7 @@ class Main:
         try:
             # Convert to Path object for better handling
             json_path = Path(file_path)
+            persistence.writer.flush(json_path)     # a save of it may still be queued
 
             if not json_path.exists():
                 print(f"❌ File not found from Main: {file_path}")
@@ -124,9 +90,7 @@ class Main:
             return None
 
     def get_currentChat(self):
-        logPath = Path(data_dir) / "Save" / ".temp.json"
-        log = self.read_json_file(logPath)
-        return log["LastChat"]
+        return session.last_chat
 
     def get_currentBot(self):
         chatJson = self.get_currentChat()
@@ -173,7 +137,8 @@ class Main:
         settingsBot.close()
 
     def quick_select_chat(self):
-        chatName = mainChat.ui.listWidget.currentItem().text()
+        item = mainChat.ui.listWidget.currentItem()
+        chatName = item.data(Qt.UserRole) or item.text()
         if chatName == "Create New Chat [+]":
             self.newChatSettings()
         else:
@@ -195,7 +160,7 @@ class Main:
         settingsIP.ui.lineEdit.setText(ip)
 
     def exitIPSettings(self):
-        mainChat.client.ip = settingsIP.ui.lineEdit.text()
+        mainChat.client.set_server(settingsIP.ui.lineEdit.text())
         print("IP Set To: ", mainChat.client.ip)
         settingsIP.close()
 
@@ -213,25 +178,12 @@ if __name__ == "__main__":
     saveBot.mkdir(parents=True, exist_ok=True)
     current_script_path = os.path.abspath(__file__)
     parent_directory = os.path.dirname(current_script_path)
-    tempLogFile = save_dir / ".temp.json"
-    if not tempLogFile.exists():
-        """
-    
-        tempLogFileImport = Path(parent_directory)/ "Save" / ".temp.json"
-        tempLog = read_json_file(tempLogFileImport)
-        """
-        tempLog={
-                "LastOpened": "",
-                "LastChat": "",
-                "ChatList": []
-        }
-
-        with open(tempLogFile, "w", encoding="utf-8") as f:
-            json.dump(tempLog, f, indent=4)
-
     print(data_dir)
 
     app = QApplication(sys.argv)
+    # Save/.temp.json lives in memory; every window shares this object
+    session = sessionState.open_session(data_dir)
+    app.aboutToQuit.connect(session.flush)
     app.setWindowIcon(QIcon((parent_directory+r"\Img\AppIcon.png")))
     #print((parent_directory+"\Img\AppIcon.ico"))
     mainChat = chatMain.ChatMain(str(data_dir),parent_directory)
@@ -242,10 +194,13 @@ if __name__ == "__main__":
     invalidChatSettings = warningWidget.InvalidChatSettings(str(data_dir),parent_directory)
     messageEdit = chatMain.EditMessage(str(data_dir),parent_directory)
     settingsIP = chatMain.ServerIP(str(data_dir),parent_directory)
+    searchChats = chatSearch.ChatSearch(str(data_dir),parent_directory)
 
+    settingsChat.set_model_catalog(mainChat.client.catalog)
     connector = Main()
 
-    if find_json_with_format(str(data_dir) + r"\Save\Chat", SETTINGS_KEYS) is not None:
+    # Answered from Save/.catalog.json; no chat file is parsed
+    if mainChat.chat_catalog.has_chats():
         noChats = False
         mainChat.show()
 
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import requests
+
+# ======================
+# CONFIG
+# ======================
+MODEL_CATALOG_TTL = 30      # seconds a /v1/models response is trusted
+
+
+class ModelCatalog:
+    """
+    Cached view of the server's /v1/models list.
+    - entries()      → cached response data, fetched again once the TTL expires
+    - refresh()      → fetch now
+    - refresh_soon() → fetch on a background thread
+    - peek_current() → cached serving model without any network wait (UI thread)
+    - peek_ids()     → cached model ids, same rules as peek_current()
+    - add_listener(fn) → fn(entries) on the fetching thread whenever a new list is stored
+    - update(data)   → store a /v1/models response fetched elsewhere
+    - invalidate()   → forget the cache (e.g. after a failed switch)
+    """
+    def __init__(self, session, url, ttl=MODEL_CATALOG_TTL):
+        self.session = session
+        self.url = url
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._entries = None
+        self._fetched_at = 0.0
+        self.fetches = 0
+        self.hits = 0
+        self._refreshing = False
+        self._listeners = []
+
+    def add_listener(self, fn):
+        self._listeners.append(fn)
+
+    def _stored(self, data):
+        for fn in self._listeners:
+            fn(data)
+
+    def set_url(self, url):
+        with self.lock:
+            self.url = url
+        self.invalidate()
+
+    def invalidate(self):
+        with self.lock:
+            self._entries = None
+            self._fetched_at = 0.0
+
+    def refresh(self):
+        return self.entries(refresh=True)
+
+    def refresh_soon(self):
+        with self.lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_quietly, name="ModelCatalog", daemon=True).start()
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"❌ Could not refresh the model list: {e}")
+        finally:
+            with self.lock:
+                self._refreshing = False
+
+    def update(self, data):
+        with self.lock:
+            self._entries = data
+            self._fetched_at = time.monotonic()
+        self._stored(data)
+
+    def entries(self, refresh=False):
+        """
+        Model entries as reported by vLLM. If the server cannot be reached
+        the last known list is returned; with nothing cached the error is raised.
+        """
+        with self.lock:
+            fresh = self._entries is not None and time.monotonic() - self._fetched_at < self.ttl
+            if fresh and not refresh:
+                self.hits += 1
+                return self._entries
+            url = self.url
+            stale = self._entries
+
+        try:
+            r = self.session.get(url, timeout=2)
+            r.raise_for_status()
+            data = r.json()["data"]
+        except (requests.RequestException, ValueError, KeyError) as e:
+            if stale is None:
+                raise
+            print(f"❌ Model list unavailable, using cached list: {e}")
+            return stale
+
+        with self.lock:
+            self._entries = data
+            self._fetched_at = time.monotonic()
+            self.fetches += 1
+        self._stored(data)
+        return data
+
+    def ids(self, refresh=False):
+        return [entry["id"] for entry in self.entries(refresh)]
+
+    def current(self):
+        """Id of the model the server is serving."""
+        return self.entries()[0]["id"]
+
+    def peek_current(self):
+        """
+        current() from the cache only, None while nothing is cached. An
+        expired cache is still answered from and refreshed in the background.
+        """
+        entries = self._peek()
+        return entries[0]["id"] if entries else None
+
+    def peek_ids(self):
+        return [entry["id"] for entry in self._peek() or []]
+
+    def _peek(self):
+        with self.lock:
+            entries = self._entries
+            expired = entries is None or time.monotonic() - self._fetched_at >= self.ttl
+        if expired:
+            self.refresh_soon()
+        return entries
+
+    def context_length(self, model):
+        for entry in self.entries():
+            if entry["id"] == model and entry.get("max_model_len"):
+                return entry["max_model_len"]
+        return None
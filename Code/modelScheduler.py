@@ -0,0 +1,160 @@
+from PySide6.QtCore import Signal, QObject, Qt
+
+
+class ModelScheduler(QObject):
+    """
+    Sits in front of the server and groups work by the model it needs,
+    so vLLM is restarted as rarely as possible.
+    - submit(model, action) → runs now if model is loaded, otherwise queued
+    - everything queued for the loaded model runs before the next swap
+    - needs_swap() / swap_notice() let the UI warn before a swap is forced
+    - swaps / swap_seconds count the swaps actually made
+
+    An action is called on the UI thread and returns a handle with
+    add_done_callback() (a Future or a GenerationJob), or None.
+    """
+    queue_changed = Signal(object)   # {model: queued count}
+
+    # Handles finish on the engine loop; counted on the UI thread
+    _work_done = Signal()
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.client = client
+        self.running = 0
+        self.swaps = 0
+        self.swap_seconds = 0.0
+        self._queues = {}               # model → [item, ...] in submit order
+
+        self._work_done.connect(self._on_work_done, Qt.QueuedConnection)
+        client.switcher.switched.connect(self._on_switched)
+        client.switcher.failed.connect(self._on_failed)
+
+    # ----------------------
+    # Queue
+    # ----------------------
+    def submit(self, model, action, interactive=False, tag=None, on_drop=None):
+        """
+        Run `action` once `model` is loaded. Interactive work makes the
+        scheduler swap as soon as the loaded model has no work left;
+        background work waits until some other swap brings its model in.
+        on_drop(reason) is called if the work is discarded instead.
+        """
+        loaded = self.loaded_model()
+        if not self.client.switcher.busy() and (loaded is None or model == loaded):
+            self._start(action)
+            return True
+
+        self._queues.setdefault(model, []).append({
+            "action": action,
+            "interactive": interactive,
+            "tag": tag,
+            "on_drop": on_drop
+        })
+        self.queue_changed.emit(self.queued())
+        self._pump()
+        return False
+
+    def discard(self, tag):
+        """Forget queued (not yet started) work carrying `tag`. True if any was queued."""
+        found = False
+        for model in list(self._queues):
+            kept = [item for item in self._queues[model] if item["tag"] != tag]
+            found = found or len(kept) != len(self._queues[model])
+            if kept:
+                self._queues[model] = kept
+            else:
+                del self._queues[model]
+        if found:
+            self.queue_changed.emit(self.queued())
+        return found
+
+    def queued(self):
+        return {model: len(items) for model, items in self._queues.items()}
+
+    def loaded_model(self):
+        """Model the server serves as far as the catalog knows (TTL-bound, never blocks); None while unknown."""
+        return self.client.catalog.peek_current()
+
+    # ----------------------
+    # Swap warnings
+    # ----------------------
+    def needs_swap(self, model):
+        loaded = self.loaded_model()
+        if self.client.switcher.busy():
+            return model != self.client.switcher.target
+        return loaded is not None and model != loaded
+
+    def swap_notice(self, model):
+        """One-line description of what running work for `model` now would cost."""
+        loaded = self.loaded_model()
+        ahead = self.running + len(self._queues.get(loaded, []))
+        notice = f"The server has to restart to load {model} (now serving {loaded})."
+        if ahead:
+            notice += f" {ahead} job(s) for {loaded} will finish first."
+        if self.swaps:
+            notice += f" Swaps so far took {self.swap_seconds / self.swaps:.0f}s on average."
+        return notice
+
+    def stats(self):
+        return {
+            "swaps": self.swaps,
+            "swap_seconds": round(self.swap_seconds, 2),
+            "running": self.running,
+            "queued": self.queued()
+        }
+
+    # ----------------------
+    # Dispatch (UI thread)
+    # ----------------------
+    def _start(self, action):
+        handle = action()
+        if handle is None:
+            return
+        self.running += 1
+        handle.add_done_callback(lambda _: self._work_done.emit())
+
+    def _on_work_done(self):
+        self.running -= 1
+        self._pump()
+
+    def _pump(self):
+        if self.client.switcher.busy():
+            return
+
+        loaded = self.loaded_model()
+        ready = self._queues.pop(loaded, [])
+        if ready:
+            self.queue_changed.emit(self.queued())
+        for item in ready:
+            self._start(item["action"])
+
+        if self.running or not self._queues:
+            return
+
+        # Nothing left for the loaded model: swap only for work someone is waiting on
+        waiting = [model for model, items in self._queues.items()
+                   if any(item["interactive"] for item in items)]
+        if not waiting:
+            return
+        target = max(waiting, key=lambda model: len(self._queues[model]))
+        print(f"Swapping {loaded} → {target} for {len(self._queues[target])} queued job(s)")
+        self.client.switch_model(target)
+
+    def _on_switched(self, model_name, timings):
+        self.swaps += 1
+        self.swap_seconds += timings.get("total", 0.0)
+        print(f"Model swaps: {self.swaps}, {self.swap_seconds:.1f}s total")
+        self._pump()
+
+    def _on_failed(self, model_name, reason):
+        # The server state is unknown now; ask it again in the background
+        self.client.catalog.invalidate()
+        self.client.catalog.refresh_soon()
+        dropped = self._queues.pop(model_name, [])
+        if dropped:
+            self.queue_changed.emit(self.queued())
+        for item in dropped:
+            if item["on_drop"] is not None:
+                item["on_drop"](reason)
+        self._pump()
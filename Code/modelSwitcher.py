@@ -0,0 +1,174 @@
+import asyncio
+import time
+
+import aiohttp
+from PySide6.QtCore import Signal, QObject
+
+# ======================
+# CONFIG
+# ======================
+DRAIN_TIMEOUT = 10          # seconds in-flight streams may finish before being cancelled
+READY_TIMEOUT = 180         # seconds the server may take to come back
+BACKOFF_START = 0.25        # first readiness poll delay
+BACKOFF_MAX = 4.0
+WARMUP_TIMEOUT = 60
+
+IDLE = "idle"
+DRAINING = "draining"
+REQUESTING = "requesting"
+WAITING = "waiting"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelSwitcher(QObject):
+    """
+    Switches the vLLM server to another model without blocking the UI.
+    Runs on the client's StreamEngine loop and moves through
+    draining → requesting → waiting → warming → ready (or failed).
+    Work that needs the new model waits in the ModelScheduler, which
+    listens to switched/failed. Every phase is timed.
+    """
+    state_changed = Signal(str)
+    switched = Signal(str, object)   # model, phase timings
+    failed = Signal(str, str)        # model, reason
+
+    # Emitted from the engine loop, delivered queued on the UI thread
+    _phase = Signal(str)
+    _finished = Signal(str, bool, str, object)
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.client = client
+        self.state = IDLE
+        self.target = None
+        self.timings = {}
+        self._future = None
+        self._phase.connect(self._on_phase)
+        self._finished.connect(self._on_finished)
+
+    def busy(self):
+        return self.state not in (IDLE, READY, FAILED)
+
+    def switch(self, model_name: str):
+        if self.busy():
+            if model_name == self.target:
+                return self._future
+            # A newer request wins; the running one is abandoned
+            self._future.cancel()
+
+        self.target = model_name
+        self.timings = {}
+        self._set_state(DRAINING)
+        self._future = asyncio.run_coroutine_threadsafe(
+            self._run(model_name,
+                      self.client.ADMIN_URL,
+                      self.client.MODELS_URL,
+                      self.client.VLLM_URL),
+            self.client.engine.loop
+        )
+        return self._future
+
+    def _set_state(self, state):
+        self.state = state
+        print(f"Model switch: {state}")
+        self.state_changed.emit(state)
+
+    def _on_phase(self, state):
+        if self.busy():
+            self._set_state(state)
+
+    def _on_finished(self, model_name, ok, reason, timings):
+        if model_name != self.target:
+            return
+        self.timings = timings
+        if ok:
+            self._set_state(READY)
+            self.switched.emit(model_name, timings)
+        else:
+            print(f"❌ Model switch to {model_name} failed: {reason}")
+            self._set_state(FAILED)
+            self.failed.emit(model_name, reason)
+
+    # ----------------------
+    # Phases (engine loop)
+    # ----------------------
+    async def _run(self, model_name, admin_url, models_url, chat_url):
+        timings = {}
+        session = self.client.engine.session
+        try:
+            start = time.perf_counter()
+            await self._drain(model_name)
+            timings[DRAINING] = time.perf_counter() - start
+
+            self._phase.emit(REQUESTING)
+            start = time.perf_counter()
+            async with session.post(admin_url, params={"model": model_name},
+                                    timeout=aiohttp.ClientTimeout(total=5)) as r:
+                r.raise_for_status()
+            timings[REQUESTING] = time.perf_counter() - start
+
+            self._phase.emit(WAITING)
+            start = time.perf_counter()
+            await self._wait_ready(session, models_url, model_name)
+            timings[WAITING] = time.perf_counter() - start
+
+            self._phase.emit(WARMING)
+            start = time.perf_counter()
+            await self._warm_up(session, chat_url, model_name)
+            timings[WARMING] = time.perf_counter() - start
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            timings["total"] = sum(timings.values())
+            self._finished.emit(model_name, False, str(e) or type(e).__name__, timings)
+            return
+
+        timings["total"] = sum(timings.values())
+        self._finished.emit(model_name, True, "", timings)
+
+    async def _drain(self, model_name):
+        """Let in-flight streams finish, then cancel whatever is still running."""
+        running = [ctx for ctx in list(self.client.contexts.values()) if ctx.streaming()]
+        if not running:
+            return
+        jobs = [ctx.job for ctx in running]
+        await asyncio.wait([asyncio.ensure_future(job) for job in jobs], timeout=DRAIN_TIMEOUT)
+
+        for ctx, job in zip(running, jobs):
+            if not job.done():
+                job.cancel()
+                self.client._job_dropped.emit(job.id, f"cancelled for the switch to {model_name}")
+        await asyncio.to_thread(lambda: [job.wait_cancelled(DRAIN_TIMEOUT) for job in jobs])
+
+    async def _wait_ready(self, session, models_url, model_name):
+        """Poll /v1/models with exponential backoff until the new model is served."""
+        deadline = time.monotonic() + READY_TIMEOUT
+        delay = BACKOFF_START
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(models_url, timeout=aiohttp.ClientTimeout(total=2)) as r:
+                    if r.status == 200:
+                        data = await r.json()
+                        if any(entry["id"] == model_name for entry in data["data"]):
+                            self.client.catalog.update(data["data"])
+                            return
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError):
+                pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BACKOFF_MAX)
+        raise RuntimeError("LLM server did not come back online")
+
+    async def _warm_up(self, session, chat_url, model_name):
+        """One-token request so the first real turn does not pay for lazy init."""
+        payload = {
+            "model": model_name,
+            "messages": [{"role": "user", "content": "Hi"}],
+            "max_tokens": 1,
+            "stream": False
+        }
+        async with session.post(chat_url, json=payload,
+                                timeout=aiohttp.ClientTimeout(total=WARMUP_TIMEOUT)) as r:
+            r.raise_for_status()
+            await r.read()
@@ -0,0 +1,202 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# ======================
+# CONFIG
+# ======================
+LATENCY_SAMPLES = 512      # recent writes kept for the latency percentiles
+
+
+def write_json_atomic(path, doc, indent=4):
+    """Write `doc` to a temp file, fsync it and rename it over `path`. Returns the size."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=indent, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+def write_bytes_atomic(path, data):
+    """write_json_atomic for data that is already encoded."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(data)
+
+
+def _key(key):
+    return os.path.normpath(str(key))
+
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class PersistenceWriter:
+    """
+    One background thread for every file the app writes, so the UI
+    thread never waits for the disk.
+    - write_json(path, doc) → atomic rewrite; replaces any older pending write of the file
+    - append(key, path, raw) → bytes appended in order; pending appends go out as one write
+    - submit(key, fn, replaces=False) → any other write, in order with the key's others
+    - flush(key=None)       → wait until the key's (or all) writes are on disk
+    - stats()               → queue depth, coalesced writes, latency
+    Work is grouped by key (a file path); keys are served oldest first.
+    Everything pending is written at exit.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()     # key → [op, ...]
+        self._active = None               # key being written right now
+        self._thread = None
+        self.writes = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.max_depth = 0
+        self._latency = []                # submit → on disk, seconds
+        self._duration = []               # time spent writing, seconds
+        atexit.register(self.close)
+
+    # ----------------------
+    # Queue (any thread)
+    # ----------------------
+    def submit(self, key, fn, replaces=False):
+        """Run fn() on the writer thread. replaces=True drops the key's pending ops first."""
+        with self._cond:
+            self._queue(_key(key), {"fn": fn, "submitted": time.perf_counter()}, replaces)
+
+    def write_json(self, path, doc, indent=4, key=None, then=None):
+        """
+        Atomically replace `path` with `doc`. `doc` must not change afterwards
+        (pass a copy); then(size) runs on the writer thread once it is written.
+        """
+        def write():
+            size = write_json_atomic(path, doc, indent)
+            if then is not None:
+                then(size)
+        self.submit(key or path, write, replaces=True)
+
+    def append(self, key, path, raw):
+        key = _key(key)
+        with self._cond:
+            ops = self._pending.get(key)
+            if ops and ops[-1].get("append") == path:
+                ops[-1]["raw"] += raw
+                self.coalesced += 1
+                return
+            self._queue(key, {"append": path, "raw": raw, "submitted": time.perf_counter()}, False)
+
+    def _queue(self, key, op, replaces):
+        # Caller holds self._cond
+        ops = self._pending.setdefault(key, [])
+        if replaces and ops:
+            self.coalesced += len(ops)
+            ops.clear()
+        ops.append(op)
+        self.max_depth = max(self.max_depth, self._depth())
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="PersistenceWriter", daemon=True)
+            self._thread.start()
+        self._cond.notify_all()
+
+    def _depth(self):
+        return sum(len(ops) for ops in self._pending.values())
+
+    def flush(self, key=None, timeout=None):
+        """Block until the writes of `key` (or all writes) are done. False on timeout."""
+        if threading.current_thread() is self._thread:
+            return True          # called from a write: it is already in order
+        key = None if key is None else _key(key)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while (key in self._pending or self._active == key) if key is not None \
+                    else (self._pending or self._active is not None):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def pending(self, key=None):
+        with self._cond:
+            return _key(key) in self._pending if key is not None else self._depth()
+
+    def close(self):
+        if not self.flush(timeout=30):
+            print(f"❌ {self.pending()} write(s) still pending at exit")
+        elif self.writes:
+            stats = self.stats()
+            print(f"✅ Persistence: {stats['writes']} write(s), {stats['coalesced']} coalesced, "
+                  f"p95 latency {stats['latency_p95_ms']} ms, max queue {stats['max_queue_depth']}")
+
+    # ----------------------
+    # Writer thread
+    # ----------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                key, ops = self._pending.popitem(last=False)
+                self._active = key
+
+            for op in ops:
+                start = time.perf_counter()
+                try:
+                    if "append" in op:
+                        with open(op["append"], "ab") as f:
+                            f.write(op["raw"])
+                            f.flush()
+                            os.fsync(f.fileno())
+                    else:
+                        op["fn"]()
+                except Exception as e:
+                    self.errors += 1
+                    print(f"❌ Write failed for {Path(str(key)).name}: {e}")
+                end = time.perf_counter()
+                self.writes += 1
+                self._duration.append(end - start)
+                self._latency.append(end - op["submitted"])
+                del self._duration[:-LATENCY_SAMPLES]
+                del self._latency[:-LATENCY_SAMPLES]
+
+            with self._cond:
+                self._active = None
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            latency = list(self._latency)
+            duration = list(self._duration)
+            depth = self._depth()
+        ms = lambda v: round(v * 1000, 2) if v is not None else None
+        return {
+            "queue_depth": depth,
+            "max_queue_depth": self.max_depth,
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "latency_p50_ms": ms(_percentile(latency, 50)),
+            "latency_p95_ms": ms(_percentile(latency, 95)),
+            "write_p50_ms": ms(_percentile(duration, 50)),
+            "write_max_ms": ms(max(duration) if duration else None)
+        }
+
+
+# One writer per process: ordering only holds within a single queue
+writer = PersistenceWriter()
@@ -0,0 +1,140 @@
+import atexit
+import json
+import os
+import threading
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QTimer
+
+import persistence
+
+# ======================
+# CONFIG
+# ======================
+FLUSH_DELAY_MS = 500       # quiet time before changes are written
+
+DEFAULTS = {
+    "LastOpened": "",
+    "LastChat": "",
+    "ChatList": []
+}
+
+
+class SessionState(QObject):
+    """
+    Save/.temp.json held in memory and shared by every window.
+    - last_chat / last_opened → plain attributes backed by the file
+    - chat_list               → chat names, most recently used last
+    - touch / rename          → MRU updates
+    Changes are handed to persistence.writer FLUSH_DELAY_MS after the last
+    one (temp file + rename), and always on exit.
+    """
+    def __init__(self, path):
+        super().__init__()
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.writes = 0
+        self._dirty = False
+        self._data = self._read()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(FLUSH_DELAY_MS)
+        self._timer.timeout.connect(self.flush)
+        atexit.register(self.flush)
+
+        if not self.path.exists():
+            self.flush_soon()
+
+    def _read(self):
+        data = dict(DEFAULTS, ChatList=[])
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"❌ Invalid JSON format: {e}")
+        return data
+
+    # ----------------------
+    # State
+    # ----------------------
+    @property
+    def last_chat(self):
+        return self._data["LastChat"]
+
+    @last_chat.setter
+    def last_chat(self, path):
+        self._set("LastChat", str(path))
+
+    @property
+    def last_opened(self):
+        return self._data["LastOpened"]
+
+    @last_opened.setter
+    def last_opened(self, value):
+        self._set("LastOpened", value)
+
+    def chat_list(self):
+        with self.lock:
+            return list(self._data["ChatList"])
+
+    def touch(self, name):
+        """Move `name` to the most recent end of the chat list."""
+        with self.lock:
+            chats = self._data["ChatList"]
+            if chats and chats[-1] == name:
+                return
+            if name in chats:
+                chats.remove(name)
+            chats.append(name)
+        self.flush_soon()
+
+    def rename(self, old, new):
+        """`old` was saved as `new`; `new` becomes the most recent chat."""
+        with self.lock:
+            chats = self._data["ChatList"]
+            if old and old != new and old in chats:
+                chats.remove(old)
+        self.touch(new)
+
+    def _set(self, key, value):
+        with self.lock:
+            if self._data[key] == value:
+                return
+            self._data[key] = value
+        self.flush_soon()
+
+    # ----------------------
+    # Persistence
+    # ----------------------
+    def flush_soon(self):
+        self._dirty = True
+        self._timer.start()
+
+    def flush(self):
+        """Queue a write now if anything changed."""
+        with self.lock:
+            if not self._dirty:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                print(f"❌ Could not save session state: {e}")
+                return
+            data = dict(self._data, ChatList=list(self._data["ChatList"]))
+            persistence.writer.write_json(self.path, data)
+            self._dirty = False
+            self.writes += 1
+
+
+_sessions = {}
+
+
+def open_session(data_dir):
+    """The one SessionState for `data_dir`/Save/.temp.json."""
+    path = os.path.normpath(str(Path(data_dir) / "Save" / ".temp.json"))
+    if path not in _sessions:
+        _sessions[path] = SessionState(path)
+    return _sessions[path]
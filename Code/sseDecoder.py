@@ -0,0 +1,120 @@
+import json
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+# ======================
+# CONFIG
+# ======================
+READ_CHUNK_SIZE = 64 * 1024       # bytes requested per socket read
+
+_DATA = b"data: "
+_DONE = b"[DONE]"
+_FAST_KEY = b'"delta":{"content":"'
+_FINISH_NULL = b'"finish_reason":null'
+_USAGE = b'"usage":{'
+
+
+def _escaped(line, quote):
+    """True if the quote at index `quote` is preceded by an odd run of backslashes."""
+    count = 0
+    i = quote - 1
+    while i >= 0 and line[i] == 0x5C:
+        count += 1
+        i -= 1
+    return count % 2 == 1
+
+
+class SseDecoder:
+    """
+    Incremental decoder for vLLM's OpenAI-style chat completion stream.
+    - feed(bytes) → list of content deltas found in the new data
+    - finish_reason / usage are kept from the frames that carry them
+    - done is set once "data: [DONE]" has been seen
+
+    Frames shaped like {"choices":[{"delta":{"content":"..."}, ...}]} are
+    decoded by slicing the content string out directly; anything else
+    falls back to a full JSON parse.
+    """
+    def __init__(self):
+        self._buffer = bytearray()
+        self.done = False
+        self.finish_reason = None
+        self.usage = None
+        self.fast_frames = 0
+        self.slow_frames = 0
+
+    def feed(self, data) -> list:
+        buf = self._buffer
+        buf += data
+        out = []
+        start = 0
+
+        while not self.done:
+            end = buf.find(b"\n", start)
+            if end < 0:
+                break
+            line_start = start
+            start = end + 1
+
+            if not buf.startswith(_DATA, line_start):
+                continue
+            line = bytes(buf[line_start + 6:end]).rstrip(b"\r")
+
+            if line == _DONE:
+                self.done = True
+                break
+
+            content = self._fast_content(line)
+            if content is None:
+                content = self._slow_content(line)
+            if content:
+                out.append(content)
+
+        # Only the unterminated tail is kept for the next read
+        del buf[:start]
+        return out
+
+    def _fast_content(self, line):
+        key = line.find(_FAST_KEY)
+        if key < 0:
+            return None
+        begin = key + len(_FAST_KEY)
+
+        # First unescaped quote closes the content string
+        end = line.find(b'"', begin)
+        while end > 0 and _escaped(line, end):
+            end = line.find(b'"', end + 1)
+        if end < 0 or line[end + 1:end + 2] != b"}":
+            return None   # delta carries more than content
+
+        rest = line[end:]
+        if _FINISH_NULL not in rest or _USAGE in rest:
+            return None
+
+        raw = line[begin:end]
+        self.fast_frames += 1
+        if b"\\" in raw:
+            return _loads(b'"' + raw + b'"')
+        return raw.decode("utf-8")
+
+    def _slow_content(self, line):
+        self.slow_frames += 1
+        chunk = _loads(line)
+
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+
+        choices = chunk.get("choices")
+        if not choices:
+            return None
+        choice = choices[0]
+        if choice.get("finish_reason"):
+            self.finish_reason = choice["finish_reason"]
+
+        delta = choice.get("delta") or {}
+        return delta.get("content")
@@ -0,0 +1,295 @@
+import asyncio
+import itertools
+import threading
+import time
+
+import aiohttp
+
+from sseDecoder import SseDecoder, READ_CHUNK_SIZE
+
+# ======================
+# CONFIG
+# ======================
+MAX_CONNECTIONS = 8        # concurrent streams sharing the loop
+KEEPALIVE_TIMEOUT = 60     # seconds an idle socket is kept open
+STREAM_TIMEOUT = 600
+PRECONNECT_TIMEOUT = 2
+
+
+def _percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class GenerationJob:
+    """
+    One streamed completion running on the StreamEngine loop.
+    - id       → monotonically increasing, used to drop stale tokens
+    - cancel() → stops the stream, safe to call from any thread
+    - await job / job.result() → full response text
+    - stats()  → latency breakdown once the job is done
+    """
+    def __init__(self, job_id, engine):
+        self.id = job_id
+        self.text = ""
+        self.finish_reason = None
+        self.usage = None
+        self.cancelled = False
+        self.cancel_latency = None      # seconds from cancel() to connection closed
+
+        # perf_counter timestamps; all but submitted are taken on the engine loop
+        self.queue_time = 0.0           # spent waiting for its model, set by the caller
+        self.submitted = time.perf_counter()
+        self.sent = None                # payload built (summary included), request posted
+        self.first_byte = None
+        self.first_token = None
+        self.last_token = None
+        self.tokens = 0
+        # One timestamp per socket read that carried tokens: frames batched
+        # into the same read share an arrival time, so per-token gaps would be 0
+        self.read_times = []
+        self._engine = engine
+        self._future = None
+        self._task = None
+        self._cancel_requested = None
+        self._finished = threading.Event()
+
+    def cancel(self):
+        """Request cancellation; the socket is closed on the loop right away."""
+        if self.cancelled or self._finished.is_set():
+            return
+        self.cancelled = True
+        self._cancel_requested = time.perf_counter()
+        self._engine.loop.call_soon_threadsafe(self._cancel_in_loop)
+
+    def _cancel_in_loop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def wait_cancelled(self, timeout=None):
+        """Block until a cancelled job has closed its connection. False on timeout."""
+        return self._finished.wait(timeout)
+
+    def done(self):
+        return self._finished.is_set()
+
+    def result(self, timeout=None):
+        """Block until the job ends. Raises CancelledError for cancelled jobs."""
+        return self._future.result(timeout)
+
+    def stats(self):
+        """
+        Where the time went, in seconds unless named otherwise:
+        queue → prepare (payload + summary) → ttfb → first token → decode.
+        itl_* are gaps between reads that carried tokens; tokens_per_read
+        above 1 means frames arrived batched.
+        """
+        if self.first_token is None:
+            return {}
+        gaps = sorted(b - a for a, b in zip(self.read_times, self.read_times[1:]))
+        usage = self.usage or {}
+        completion = usage.get("completion_tokens") or self.tokens
+        decode = self.last_token - self.first_token
+        return {
+            "queue": round(self.queue_time, 3),
+            "prepare": round(self.sent - self.submitted, 3),
+            "ttfb": round(self.first_byte - self.sent, 3),
+            "ttft": round(self.first_token - self.submitted, 3),
+            "itl_p50_ms": round(_percentile(gaps, 50) * 1000, 1),
+            "itl_p95_ms": round(_percentile(gaps, 95) * 1000, 1),
+            "tokens_per_read": round(self.tokens / len(self.read_times), 2),
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": completion,
+            "tokens_per_s": round((completion - 1) / decode, 1) if decode > 0 else None
+        }
+
+    def add_done_callback(self, fn):
+        """Call fn(job) on the engine loop thread once the job has ended."""
+        self._future.add_done_callback(lambda _: fn(self))
+
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
+
+
+class StreamEngine:
+    """
+    A single asyncio loop on one background thread that serves every
+    generation. Callbacks are invoked from the loop thread; hook them to
+    Qt signals so Qt queues them onto the UI thread.
+    """
+    def __init__(self, on_token, on_done, on_error):
+        self._on_token = on_token
+        self._on_done = on_done
+        self._on_error = on_error
+
+        self._ids = itertools.count(1)
+        self._session = None
+        self.requests = 0          # sent through the pool...
+        self.connections = 0       # ...and sockets it had to open for them
+        self.loop = asyncio.new_event_loop()
+
+        ready = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run_loop,
+            args=(ready,),
+            name="StreamEngine",
+            daemon=True
+        )
+        self._thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._open())
+        ready.set()
+        self.loop.run_forever()
+
+    async def _open(self):
+        connector = aiohttp.TCPConnector(
+            limit=MAX_CONNECTIONS,
+            keepalive_timeout=KEEPALIVE_TIMEOUT
+        )
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._count_request)
+        trace.on_connection_create_end.append(self._count_connection)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=STREAM_TIMEOUT),
+            trace_configs=[trace]
+        )
+
+    async def _count_request(self, session, context, params):
+        self.requests += 1
+
+    async def _count_connection(self, session, context, params):
+        self.connections += 1
+
+    @property
+    def session(self):
+        """The pooled aiohttp session; only use it from coroutines on this loop."""
+        return self._session
+
+    # ----------------------
+    # Connection pool
+    # ----------------------
+    def preconnect(self, url):
+        """Open a keep-alive socket to `url`'s host in the background, so the next stream reuses it."""
+        return asyncio.run_coroutine_threadsafe(self._preconnect(url), self.loop)
+
+    async def _preconnect(self, url):
+        try:
+            async with self._session.get(url, timeout=aiohttp.ClientTimeout(total=PRECONNECT_TIMEOUT)) as r:
+                await r.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"❌ Pre-connect to {url} failed: {e}")
+
+    def pool_stats(self):
+        """Requests sent vs sockets opened by the stream pool."""
+        return {"requests": self.requests, "connections": self.connections}
+
+    # ----------------------
+    # Jobs
+    # ----------------------
+    def submit(self, url, build_payload):
+        """
+        Start a streamed completion. build_payload is called off the UI
+        thread (it may need to summarize) and must return the request body.
+        """
+        job = GenerationJob(next(self._ids), self)
+        job._future = asyncio.run_coroutine_threadsafe(
+            self._run_job(job, url, build_payload),
+            self.loop
+        )
+        return job
+
+    async def _run_job(self, job, url, build_payload):
+        job._task = asyncio.current_task()
+        try:
+            if job.cancelled:
+                raise asyncio.CancelledError()
+            payload = await asyncio.to_thread(build_payload)
+            await self._stream(job, url, payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not job.cancelled:
+                self._on_error(job.id, str(e))
+            raise
+        else:
+            if not job.cancelled:
+                self._on_done(job.id, job.text)
+            return job.text
+        finally:
+            if job.cancelled:
+                job.cancel_latency = time.perf_counter() - job._cancel_requested
+            job._finished.set()
+
+    async def _stream(self, job, url, payload):
+        decoder = SseDecoder()
+        parts = []
+        job.sent = time.perf_counter()
+        async with self._session.post(url, json=payload) as r:
+            r.raise_for_status()
+            try:
+                async for data in r.content.iter_chunked(READ_CHUNK_SIZE):
+                    now = time.perf_counter()
+                    if job.first_byte is None:
+                        job.first_byte = now
+                    contents = decoder.feed(data)
+                    if contents:
+                        if job.first_token is None:
+                            job.first_token = now
+                        job.last_token = now
+                        job.read_times.append(now)
+                        job.tokens += len(contents)
+                    for content in contents:
+                        parts.append(content)
+                        self._on_token(job.id, content)
+                    if decoder.done:
+                        break
+            except asyncio.CancelledError:
+                # Drop the socket instead of draining it: vLLM sees the
+                # disconnect, aborts the sequence and frees its KV blocks
+                r.close()
+                raise
+
+        job.text = "".join(parts)
+        job.finish_reason = decoder.finish_reason
+        job.usage = decoder.usage
+
+    def request(self, url, build_payload):
+        """
+        Send one non-streamed completion (e.g. a prefill) off the UI thread.
+        Returns a Future with the decoded JSON reply.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._request(url, build_payload),
+            self.loop
+        )
+
+    async def _request(self, url, build_payload):
+        payload = await asyncio.to_thread(build_payload)
+        async with self._session.post(url, json=payload) as r:
+            r.raise_for_status()
+            return await r.json()
+
+    def run_background(self, fn, *args):
+        """Run a blocking helper (e.g. a summary) off the UI thread; returns a Future."""
+        return asyncio.run_coroutine_threadsafe(
+            asyncio.to_thread(fn, *args),
+            self.loop
+        )
+
+    def close(self, timeout=5):
+        """Close the pooled session and the helper threads, then stop the loop and wait for its thread."""
+        for closing in (self._session.close(), self.loop.shutdown_default_executor()):
+            try:
+                asyncio.run_coroutine_threadsafe(closing, self.loop).result(timeout)
+            except Exception as e:
+                print(f"❌ Stream engine did not close cleanly: {e!r}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
@@ -0,0 +1,64 @@
+import threading
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# ======================
+# CONFIG
+# ======================
+TOKENIZER_ENCODING = "o200k_base"   # gpt-oss family
+MESSAGE_OVERHEAD = 4                # chat template tokens around each message
+DEFAULT_CHARS_PER_TOKEN = 3.5
+CALIBRATION_WEIGHT = 0.2            # EMA weight of each server observation
+ESTIMATE_MARGIN = 1.10              # headroom while counts are only estimated
+
+
+class TokenCounter:
+    """
+    Counts tokens with a local tokenizer when tiktoken is installed,
+    otherwise with a chars-per-token estimate that is calibrated against
+    the prompt token counts the server reports back.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chars_per_token = DEFAULT_CHARS_PER_TOKEN
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                print(f"❌ Tokenizer unavailable, estimating tokens: {e}")
+
+    @property
+    def exact(self):
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        with self.lock:
+            ratio = self.chars_per_token
+        # Round up and pad: overflowing the context is worse than wasting a bit
+        return int(len(text) / ratio * ESTIMATE_MARGIN) + 1
+
+    def count_message(self, msg) -> int:
+        """Token count of one message, cached on the message under "tokens"."""
+        tokens = msg.get("tokens")
+        if tokens is None:
+            tokens = self.count(msg["content"]) + MESSAGE_OVERHEAD
+            msg["tokens"] = tokens
+        return tokens
+
+    def calibrate(self, messages, prompt_tokens):
+        """Fold a server-reported prompt size into the estimate."""
+        if self.encoding is not None or not prompt_tokens:
+            return
+        chars = sum(len(m["content"]) for m in messages)
+        content_tokens = prompt_tokens - MESSAGE_OVERHEAD * len(messages)
+        if chars <= 0 or content_tokens <= 0:
+            return
+        with self.lock:
+            observed = chars / content_tokens
+            self.chars_per_token += CALIBRATION_WEIGHT * (observed - self.chars_per_token)